@@ -0,0 +1,157 @@
+"""Initial schema
+
+The tables as Base.metadata.create_all built them before migrations were
+introduced. Databases created that way should be stamped at this revision
+(alembic stamp 0001) and then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('email', sa.String(255), nullable=False),
+        sa.Column('full_name', sa.String(255)),
+        sa.Column('gmail_refresh_token', sa.String, nullable=False),
+        sa.Column('gmail_token_encrypted_at', sa.DateTime),
+        sa.Column('profile_picture_url', sa.String),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('last_login_at', sa.DateTime),
+        sa.Column('last_scan_at', sa.DateTime),
+        sa.Column('subscription_count', sa.Integer),
+        sa.Column('total_monthly_spend', sa.Numeric(10, 2)),
+        sa.Column('is_active', sa.Boolean),
+        sa.Column('deleted_at', sa.DateTime, nullable=True),
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_is_active', 'users', ['is_active'])
+    
+    op.create_table(
+        'subscriptions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('service_name', sa.String(255), nullable=False),
+        sa.Column('service_domain', sa.String(255)),
+        sa.Column('service_logo_url', sa.String),
+        sa.Column('service_category', sa.String(100)),
+        sa.Column('price', sa.Numeric(10, 2), nullable=False),
+        sa.Column('currency', sa.String(3)),
+        sa.Column('billing_period', sa.String(50), nullable=False),
+        sa.Column('first_detected_date', sa.Date),
+        sa.Column('next_renewal_date', sa.Date),
+        sa.Column('last_verified_date', sa.DateTime),
+        sa.Column('unsubscribe_link', sa.String),
+        sa.Column('manage_account_link', sa.String),
+        sa.Column('payment_method_last4', sa.String(4)),
+        sa.Column('subscription_tier', sa.String(100)),
+        sa.Column('status', sa.String(50)),
+        sa.Column('source_email_ids', postgresql.ARRAY(sa.String)),
+        sa.Column('detection_confidence', sa.Numeric(3, 2)),
+        sa.Column('detected_by', sa.String(50)),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+        sa.Column('cancelled_at', sa.DateTime),
+    )
+    op.create_index('ix_subscriptions_user_id', 'subscriptions', ['user_id'])
+    op.create_index('ix_subscriptions_service_name', 'subscriptions', ['service_name'])
+    op.create_index('ix_subscriptions_next_renewal_date', 'subscriptions', ['next_renewal_date'])
+    op.create_index('ix_subscriptions_status', 'subscriptions', ['status'])
+    op.create_index('ix_subscriptions_created_at', 'subscriptions', ['created_at'])
+    
+    op.create_table(
+        'email_import_sessions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('status', sa.String(50)),
+        sa.Column('total_emails_found', sa.Integer),
+        sa.Column('emails_processed', sa.Integer),
+        sa.Column('subscriptions_found', sa.Integer),
+        sa.Column('started_at', sa.DateTime),
+        sa.Column('completed_at', sa.DateTime),
+        sa.Column('error_message', sa.String),
+        sa.Column('scan_params', sa.JSON),
+    )
+    op.create_index('ix_email_import_sessions_user_id', 'email_import_sessions', ['user_id'])
+    op.create_index('ix_email_import_sessions_status', 'email_import_sessions', ['status'])
+    op.create_index('ix_email_import_sessions_started_at', 'email_import_sessions', ['started_at'])
+    
+    op.create_table(
+        'subscription_events',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('subscription_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('subscriptions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_type', sa.String(100), nullable=False),
+        sa.Column('event_description', sa.String),
+        sa.Column('event_metadata', sa.JSON),
+        sa.Column('triggered_by', sa.String(100)),
+        sa.Column('created_at', sa.DateTime),
+    )
+    op.create_index('ix_subscription_events_subscription_id', 'subscription_events', ['subscription_id'])
+    op.create_index('ix_subscription_events_user_id', 'subscription_events', ['user_id'])
+    op.create_index('ix_subscription_events_event_type', 'subscription_events', ['event_type'])
+    op.create_index('ix_subscription_events_created_at', 'subscription_events', ['created_at'])
+    
+    op.create_table(
+        'unsubscribe_actions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('subscription_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('subscriptions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('action_type', sa.String(50), nullable=False),
+        sa.Column('status', sa.String(50)),
+        sa.Column('unsubscribe_url', sa.String),
+        sa.Column('http_method', sa.String(10)),
+        sa.Column('form_data', sa.JSON),
+        sa.Column('http_status_code', sa.Integer),
+        sa.Column('response_body_snippet', sa.String),
+        sa.Column('confirmation_email_id', sa.String(255)),
+        sa.Column('confirmation_detected_at', sa.DateTime),
+        sa.Column('retry_count', sa.Integer),
+        sa.Column('max_retries', sa.Integer),
+        sa.Column('error_message', sa.String),
+        sa.Column('requires_manual_action', sa.Boolean),
+        sa.Column('manual_instructions', sa.String),
+        sa.Column('initiated_at', sa.DateTime),
+        sa.Column('completed_at', sa.DateTime),
+        sa.Column('monitoring_until', sa.DateTime),
+    )
+    op.create_index('ix_unsubscribe_actions_subscription_id', 'unsubscribe_actions', ['subscription_id'])
+    op.create_index('ix_unsubscribe_actions_user_id', 'unsubscribe_actions', ['user_id'])
+    op.create_index('ix_unsubscribe_actions_status', 'unsubscribe_actions', ['status'])
+    op.create_index('ix_unsubscribe_actions_monitoring_until', 'unsubscribe_actions', ['monitoring_until'])
+    
+    op.create_table(
+        'activity_log',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('activity_type', sa.String(100), nullable=False),
+        sa.Column('activity_description', sa.String, nullable=False),
+        sa.Column('related_subscription_id', postgresql.UUID(as_uuid=True)),
+        sa.Column('related_session_id', postgresql.UUID(as_uuid=True)),
+        sa.Column('related_action_id', postgresql.UUID(as_uuid=True)),
+        sa.Column('activity_metadata', sa.JSON),
+        sa.Column('created_at', sa.DateTime),
+    )
+    op.create_index('ix_activity_log_user_id', 'activity_log', ['user_id'])
+    op.create_index('ix_activity_log_activity_type', 'activity_log', ['activity_type'])
+    op.create_index('ix_activity_log_created_at', 'activity_log', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('activity_log')
+    op.drop_table('unsubscribe_actions')
+    op.drop_table('subscription_events')
+    op.drop_table('email_import_sessions')
+    op.drop_table('subscriptions')
+    op.drop_table('users')
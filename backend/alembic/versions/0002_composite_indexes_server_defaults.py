@@ -0,0 +1,63 @@
+"""Composite indexes and server-side timestamp defaults
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+UTC_NOW = sa.text("timezone('utc', now())")
+
+# (table, column) pairs that get a database-side default of the current UTC time
+TIMESTAMP_DEFAULTS = [
+    ('users', 'created_at'),
+    ('subscriptions', 'created_at'),
+    ('subscriptions', 'updated_at'),
+    ('subscription_events', 'created_at'),
+    ('email_import_sessions', 'started_at'),
+    ('unsubscribe_actions', 'initiated_at'),
+    ('activity_log', 'created_at'),
+]
+
+
+def upgrade() -> None:
+    for table, column in TIMESTAMP_DEFAULTS:
+        op.alter_column(table, column, server_default=UTC_NOW)
+    
+    # Build the new indexes without locking writes on live tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_subscriptions_user_id_status',
+            'subscriptions',
+            ['user_id', 'status'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_activity_log_user_id_created_at',
+            'activity_log',
+            ['user_id', sa.text('created_at DESC')],
+            postgresql_concurrently=True
+        )
+        # Superseded by the (user_id, created_at DESC) index
+        op.drop_index('ix_activity_log_created_at', 'activity_log', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_activity_log_created_at',
+            'activity_log',
+            ['created_at'],
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_activity_log_user_id_created_at', 'activity_log', postgresql_concurrently=True)
+        op.drop_index('ix_subscriptions_user_id_status', 'subscriptions', postgresql_concurrently=True)
+    
+    for table, column in TIMESTAMP_DEFAULTS:
+        op.alter_column(table, column, server_default=None)
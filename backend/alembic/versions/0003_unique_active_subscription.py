@@ -0,0 +1,53 @@
+"""Unique active subscription per user and service
+
+Backs the scan's bulk INSERT ... ON CONFLICT upsert of detected
+subscriptions. Older active duplicates (only possible from concurrent
+scans) are marked expired first, keeping the most recently verified row.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text("""
+        UPDATE subscriptions SET status = 'expired'
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id, service_name
+                    ORDER BY last_verified_date DESC NULLS LAST, created_at DESC NULLS LAST
+                ) AS position
+                FROM subscriptions
+                WHERE status = 'active'
+            ) ranked
+            WHERE position > 1
+        )
+    """))
+    
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_subscriptions_user_id_service_name_active',
+            'subscriptions',
+            ['user_id', 'service_name'],
+            unique=True,
+            postgresql_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'uq_subscriptions_user_id_service_name_active',
+            'subscriptions',
+            postgresql_concurrently=True
+        )
@@ -1,19 +1,18 @@
 """Authentication endpoints"""
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database import get_db
+from sqlalchemy.dialects.postgresql import insert
+from app.database import get_db, utc_now
 from app.models import User
-from app.services.gmail_service import gmail_service
+from app.services.gmail_service import GmailService, get_gmail_service
 from app.utils.encryption import encrypt_token
-from datetime import datetime
 import uuid
 
 router = APIRouter()
 
 
 @router.get("/login")
-async def initiate_login():
+async def initiate_login(gmail_service: GmailService = Depends(get_gmail_service)):
     """Initiate Google OAuth flow"""
     try:
         auth_url, state = gmail_service.create_oauth_flow()
@@ -26,7 +25,8 @@ async def initiate_login():
 async def oauth_callback(
     code: str = Query(..., description="OAuth authorization code"),
     state: str = Query(..., description="OAuth state parameter"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    gmail_service: GmailService = Depends(get_gmail_service)
 ):
     """Handle OAuth callback and create/update user"""
     import logging
@@ -40,33 +40,32 @@ async def oauth_callback(
         user_info = tokens["user_info"]
         email = user_info["email"]
         
-        # Check if user exists
-        result = await db.execute(select(User).where(User.email == email))
-        user = result.scalar_one_or_none()
-        
         # Encrypt refresh token
         encrypted_token = encrypt_token(tokens["refresh_token"])
+        now = utc_now()
         
-        if user:
-            # Update existing user
-            user.gmail_refresh_token = encrypted_token
-            user.gmail_token_encrypted_at = datetime.utcnow()
-            user.last_login_at = datetime.utcnow()
-            user.profile_picture_url = user_info.get("picture")
-        else:
-            # Create new user
-            user = User(
-                email=email,
-                full_name=user_info.get("name"),
-                gmail_refresh_token=encrypted_token,
-                gmail_token_encrypted_at=datetime.utcnow(),
-                profile_picture_url=user_info.get("picture"),
-                last_login_at=datetime.utcnow()
-            )
-            db.add(user)
+        # Create or update the user in one atomic statement (no SELECT first,
+        # and concurrent callbacks for the same email can't race)
+        stmt = insert(User).values(
+            email=email,
+            full_name=user_info.get("name"),
+            gmail_refresh_token=encrypted_token,
+            gmail_token_encrypted_at=now,
+            profile_picture_url=user_info.get("picture"),
+            last_login_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={
+                "gmail_refresh_token": stmt.excluded.gmail_refresh_token,
+                "gmail_token_encrypted_at": stmt.excluded.gmail_token_encrypted_at,
+                "last_login_at": stmt.excluded.last_login_at,
+                "profile_picture_url": stmt.excluded.profile_picture_url
+            }
+        ).returning(User.id, User.email, User.full_name)
         
+        user = (await db.execute(stmt)).one()
         await db.commit()
-        await db.refresh(user)
         
         return {
             "user_id": str(user.id),
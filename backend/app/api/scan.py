@@ -1,12 +1,12 @@
 """Email scanning endpoints"""
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database import get_db
+from sqlalchemy import select, insert, update
+from app.database import get_db, utc_now
 from app.models import User, EmailImportSession
-from app.services.gmail_service import gmail_service
 from app.utils.encryption import decrypt_token
-from datetime import datetime
+from worker.celery_app import celery_app
+import asyncio
 import uuid
 
 router = APIRouter()
@@ -14,65 +14,117 @@ router = APIRouter()
 
 @router.post("/start")
 async def start_scan(
-    user_id: str,
+    user_id: uuid.UUID,
     date_range_years: int = 3,
     db: AsyncSession = Depends(get_db)
 ):
-    """Start email scanning process"""
-    try:
-        # Get user
-        result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Create scan session
-        session = EmailImportSession(
+    """
+    Start email scanning process
+    
+    The scan itself runs in the Celery worker. The task is published by
+    name, so the API does not import the worker's task code; if the broker
+    can't be reached the session is marked failed and 503 is returned.
+    """
+    # Get user
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Create scan session; RETURNING hands back the generated columns
+    # without a refresh SELECT
+    result = await db.execute(
+        insert(EmailImportSession)
+        .values(
             user_id=user.id,
             status='running',
             scan_params={"date_range_years": date_range_years}
         )
-        db.add(session)
-        await db.commit()
-        await db.refresh(session)
-        
-        # In production, queue Celery task here
-        # from worker.tasks import scan_gmail_inbox
-        # scan_gmail_inbox.delay(str(user.id), str(session.id), date_range_years)
-        
-        return {
-            "session_id": str(session.id),
-            "status": session.status,
-            "started_at": session.started_at.isoformat()
-        }
+        .returning(
+            EmailImportSession.id,
+            EmailImportSession.status,
+            EmailImportSession.started_at
+        )
+    )
+    session = result.one()
+    await db.commit()
     
+    # Queue the Celery scan (send_task blocks on broker I/O, so it runs in a thread)
+    try:
+        await asyncio.to_thread(
+            celery_app.send_task,
+            'scan_gmail_inbox',
+            args=[str(user.id), str(session.id), date_range_years]
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to start scan: {str(e)}")
+        await db.execute(
+            update(EmailImportSession)
+            .where(EmailImportSession.id == session.id)
+            .values(status='failed', error_message=f"Could not queue scan: {e}")
+        )
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Could not start scan, please try again")
+    
+    return {
+        "session_id": str(session.id),
+        "status": session.status,
+        "started_at": session.started_at.isoformat()
+    }
 
 
 @router.get("/status/{session_id}")
-async def get_scan_status(session_id: str, db: AsyncSession = Depends(get_db)):
+async def get_scan_status(session_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
     """Get scan progress status"""
-    try:
+    result = await db.execute(
+        select(EmailImportSession).where(EmailImportSession.id == session_id)
+    )
+    session = result.scalar_one_or_none()
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return {
+        "session_id": str(session.id),
+        "status": session.status,
+        "total_emails_found": session.total_emails_found,
+        "emails_processed": session.emails_processed,
+        "subscriptions_found": session.subscriptions_found,
+        "started_at": session.started_at.isoformat() if session.started_at else None,
+        "completed_at": session.completed_at.isoformat() if session.completed_at else None
+    }
+
+
+@router.delete("/{session_id}")
+async def cancel_scan(session_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Cancel a running scan
+    
+    The worker checks the session status between pages and stops at the
+    next check, so no further Gmail fetches or detection run for it.
+    The update only applies while the scan is running, so a scan the
+    worker has just finished is not overwritten.
+    """
+    result = await db.execute(
+        update(EmailImportSession)
+        .where(EmailImportSession.id == session_id, EmailImportSession.status == 'running')
+        .values(status='cancelled', completed_at=utc_now())
+        .returning(EmailImportSession.status)
+    )
+    status = result.scalar_one_or_none()
+    await db.commit()
+    
+    if status is None:
+        # Not running: report the status it already has
         result = await db.execute(
-            select(EmailImportSession).where(EmailImportSession.id == uuid.UUID(session_id))
+            select(EmailImportSession.status).where(EmailImportSession.id == session_id)
         )
-        session = result.scalar_one_or_none()
+        status = result.scalar_one_or_none()
         
-        if not session:
+        if status is None:
             raise HTTPException(status_code=404, detail="Session not found")
-        
-        return {
-            "session_id": str(session.id),
-            "status": session.status,
-            "total_emails_found": session.total_emails_found,
-            "emails_processed": session.emails_processed,
-            "subscriptions_found": session.subscriptions_found,
-            "started_at": session.started_at.isoformat() if session.started_at else None,
-            "completed_at": session.completed_at.isoformat() if session.completed_at else None
-        }
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get status: {str(e)}")
-
+    return {
+        "session_id": str(session_id),
+        "status": status
+    }
@@ -1,8 +1,9 @@
 """
 Configuration settings for SubScout backend
 """
-from pydantic_settings import BaseSettings
-from typing import List
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import lru_cache
+from typing import Tuple
 import os
 import logging
 
@@ -20,10 +21,10 @@ class Settings(BaseSettings):
     
     # API
     API_V1_PREFIX: str = "/api/v1"
-    ALLOWED_ORIGINS: List[str] = [
+    ALLOWED_ORIGINS: Tuple[str, ...] = (
         "http://localhost:3000",
         "https://subscout.app"
-    ]
+    )
     
     # Database
     DATABASE_URL: str = os.getenv(
@@ -51,13 +52,17 @@ class Settings(BaseSettings):
     )
     
     # Gmail API
-    GMAIL_SCOPES: List[str] = [
+    GMAIL_SCOPES: Tuple[str, ...] = (
         "https://www.googleapis.com/auth/gmail.readonly",
         "https://www.googleapis.com/auth/userinfo.email",
         "https://www.googleapis.com/auth/userinfo.profile"
-    ]
+    )
     GMAIL_API_QUOTA_PER_USER: int = 250  # Per second
     GMAIL_BATCH_SIZE: int = 500  # Emails per batch
+    GMAIL_MAX_RETRIES: int = 5  # Retries for rate-limited (429) requests
+    GMAIL_BATCH_CONCURRENCY: int = 2  # Batch calls in flight per scan
+    GMAIL_LIST_CACHE_TTL: int = 120  # Seconds to cache messages.list pages in Redis
+    GMAIL_USER_INFO_CACHE_TTL: int = 3600  # Seconds to cache Google userinfo in Redis
     
     # LLM / AI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
@@ -66,15 +71,22 @@ class Settings(BaseSettings):
     LLM_MODEL: str = "gpt-4"  # or claude-3-5-sonnet-20241022
     LLM_TEMPERATURE: float = 0.1  # Low for consistent extraction
     LLM_MAX_TOKENS: int = 1000
+    LLM_MAX_CONCURRENCY: int = 20  # LLM extraction requests in flight per scan batch
+    LLM_CACHE_TTL: int = 7 * 24 * 3600  # Seconds to reuse an extraction for the same email template
     
     # Detection
     DETECTION_CONFIDENCE_THRESHOLD: float = 0.5
     RULE_BASED_FIRST: bool = True  # Try rules before LLM
+    LLM_MIN_KEYWORD_HITS: int = 4  # Keyword hits needed to call the LLM when rules found nothing
     
     # Unsubscribe
     UNSUBSCRIBE_TIMEOUT_SECONDS: int = 30
     UNSUBSCRIBE_MAX_RETRIES: int = 3
+    UNSUBSCRIBE_REQUESTS_PER_SECOND: float = 10.0  # Outbound unsubscribe link visits
+    HTTP_MAX_CONCURRENCY: int = 20  # Unsubscribe link visits in flight per process
     CONFIRMATION_MONITORING_DAYS: int = 7
+    BROWSER_POOL_SIZE: int = 4  # Headless Chromium instances for form cancellations
+    BROWSER_POOL_RECYCLE_AFTER: int = 100  # Relaunch a browser after this many cancellations
     
     # Email scanning
     DEFAULT_SCAN_YEARS: int = 3
@@ -83,8 +95,12 @@ class Settings(BaseSettings):
         "(subscription OR billing OR renew OR payment OR invoice OR receipt)"
     )
     
+    # CPU-bound work (MIME parsing, regex extraction) in a process pool
+    PROCESS_POOL_ENABLED: bool = True  # Never used inside daemonic (Celery prefork) workers
+    PROCESS_POOL_WORKERS: int = 0  # 0 = one per CPU
+    
     # Encryption (for refresh tokens)
-    ENCRYPTION_KEY: str = os.getenv("ENCRYPTION_KEY", "")  # 32-byte key for Fernet
+    ENCRYPTION_KEY: str = os.getenv("ENCRYPTION_KEY", "")  # Fernet key: url-safe base64 of 32 bytes (44 chars)
     
     # Celery (background workers)
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/1")
@@ -101,15 +117,23 @@ class Settings(BaseSettings):
     CORS_ALLOW_CREDENTIALS: bool = True
     SECURE_COOKIES: bool = True
     
-    class Config:
-        env_file = [".env", "../.env", "../../.env"]  # Try multiple locations
-        env_file_encoding = 'utf-8'
-        case_sensitive = True
-        extra = 'ignore'  # Ignore extra fields in .env that aren't in the model
+    model_config = SettingsConfigDict(
+        env_file=(".env", "../.env", "../../.env"),  # Try multiple locations
+        env_file_encoding='utf-8',
+        case_sensitive=True,
+        extra='ignore',  # Ignore extra fields in .env that aren't in the model
+        frozen=True  # Settings are read-only after startup
+    )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load settings once per process (usable as a FastAPI dependency)"""
+    return Settings()
 
 
 # Global settings instance
-settings = Settings()
+settings = get_settings()
 
 
 # Validate critical settings on startup
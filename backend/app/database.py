@@ -1,6 +1,7 @@
 """
 Database connection and session management
 """
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
@@ -27,6 +28,16 @@ AsyncSessionLocal = async_sessionmaker(
 Base = declarative_base()
 
 
+def utc_now():
+    """
+    Current UTC time, evaluated by PostgreSQL
+    
+    Naive like the models' DateTime columns (what datetime.utcnow() used to
+    store); use as a server_default or assign it instead of a Python timestamp.
+    """
+    return func.timezone('utc', func.now())
+
+
 # Dependency for FastAPI routes
 async def get_db() -> AsyncSession:
     """Dependency to get database session"""
@@ -3,13 +3,17 @@ FastAPI main application for SubScout
 """
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import logging
+import redis.asyncio as aioredis
 from contextlib import asynccontextmanager
+from sqlalchemy import text
 from datetime import datetime
 
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine
+from app.services.gmail_service import GmailService
+from app.utils.process_pool import shutdown_process_pool
 
 # Configure logging
 logging.basicConfig(
@@ -26,30 +30,53 @@ async def lifespan(app: FastAPI):
     logger.info("Starting SubScout API...")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     
-    # Create database tables if they don't exist (gracefully handle connection errors)
+    # Schema is managed by Alembic (`alembic upgrade head` runs at deploy time);
+    # startup only checks the database is reachable
     try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database initialized successfully")
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        logger.info("Database connection OK")
     except Exception as e:
         logger.warning(f"Database connection failed: {e}")
         logger.warning("API will start but database operations will fail. Please check PostgreSQL connection and DATABASE_URL.")
     
-    # Test Redis connection
+    # Shared async Redis pool (non-blocking startup check)
+    app.state.redis = aioredis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_connect_timeout=1  # A down Redis must not stall startup or cached calls
+    )
     try:
-        import redis
-        redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-        redis_client.ping()
+        await app.state.redis.ping()
         logger.info("Redis connection successful")
-        redis_client.close()
     except Exception as e:
         logger.warning(f"Redis connection failed: {e}")
         logger.warning("API will start but Redis operations will fail. Please check Redis connection and REDIS_URL.")
     
+    # Gmail service: HTTP pool is opened on the app's event loop, Redis is shared
+    app.state.gmail_service = GmailService(cache=app.state.redis)
+    await app.state.gmail_service.startup()
+    
+    # Cancellations (unsubscribe links, headless browsers) run in the Celery
+    # worker, whose unsubscribe_service opens its clients on first use
+    
     yield
     
     # Shutdown
     logger.info("Shutting down SubScout API...")
+    # Close each resource on its own so one failure does not leak the rest
+    for name, close in (
+        ("Gmail service", app.state.gmail_service.aclose),
+        ("Redis", app.state.redis.aclose),
+    ):
+        try:
+            await close()
+        except Exception as e:
+            logger.warning(f"Error closing {name}: {e}")
+    
+    shutdown_process_pool()
+    
     try:
         await engine.dispose()
     except Exception:
@@ -61,7 +88,8 @@ app = FastAPI(
     title="SubScout API",
     description="AI-powered subscription management platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -77,7 +105,7 @@ app.add_middleware(
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": {
@@ -92,7 +120,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": {
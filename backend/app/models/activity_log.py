@@ -1,10 +1,9 @@
 """Activity log model"""
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
-from app.database import Base
+from app.database import Base, utc_now
 
 
 class ActivityLog(Base):
@@ -23,8 +22,13 @@ class ActivityLog(Base):
     
     # Metadata
     activity_metadata = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, server_default=utc_now())
     
     # Relationships
     user = relationship("User")
+    
+    __table_args__ = (
+        # Activity feed: WHERE user_id = ? ORDER BY created_at DESC
+        Index('ix_activity_log_user_id_created_at', 'user_id', created_at.desc()),
+    )
 
@@ -3,8 +3,7 @@ from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
-from app.database import Base
+from app.database import Base, utc_now
 
 
 class EmailImportSession(Base):
@@ -16,7 +15,7 @@ class EmailImportSession(Base):
     total_emails_found = Column(Integer, default=0)
     emails_processed = Column(Integer, default=0)
     subscriptions_found = Column(Integer, default=0)
-    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, server_default=utc_now(), index=True)
     completed_at = Column(DateTime)
     error_message = Column(String)
     scan_params = Column(JSON)  # Store search filters, date range, etc.
@@ -1,10 +1,9 @@
 """Subscription model"""
-from sqlalchemy import Column, String, Integer, DateTime, Date, Numeric, ForeignKey, ARRAY
+from sqlalchemy import Column, String, Integer, DateTime, Date, Numeric, ForeignKey, ARRAY, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
-from app.database import Base
+from app.database import Base, utc_now
 
 
 class Subscription(Base):
@@ -44,12 +43,24 @@ class Subscription(Base):
     detected_by = Column(String(50))  # 'rule_based', 'llm', 'manual'
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now(), index=True)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now())
     cancelled_at = Column(DateTime)
     
     # Relationships
     user = relationship("User", back_populates="subscriptions")
     events = relationship("SubscriptionEvent", back_populates="subscription", cascade="all, delete-orphan")
     unsubscribe_actions = relationship("UnsubscribeAction", back_populates="subscription", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Subscription list and dashboard stats: WHERE user_id = ? AND status = ?
+        Index('ix_subscriptions_user_id_status', 'user_id', 'status'),
+        # One active row per service: the conflict target of the scan's bulk upsert
+        Index(
+            'uq_subscriptions_user_id_service_name_active',
+            'user_id', 'service_name',
+            unique=True,
+            postgresql_where=text("status = 'active'")
+        ),
+    )
 
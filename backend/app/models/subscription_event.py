@@ -3,8 +3,7 @@ from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
-from app.database import Base
+from app.database import Base, utc_now
 
 
 class SubscriptionEvent(Base):
@@ -18,7 +17,7 @@ class SubscriptionEvent(Base):
     event_description = Column(String)
     event_metadata = Column(JSON)
     triggered_by = Column(String(100))  # 'system', 'user', 'agent_name'
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, server_default=utc_now(), index=True)
     
     # Relationships
     subscription = relationship("Subscription", back_populates="events")
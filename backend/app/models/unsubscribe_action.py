@@ -3,8 +3,7 @@ from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, J
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
-from app.database import Base
+from app.database import Base, utc_now
 
 
 class UnsubscribeAction(Base):
@@ -41,7 +40,7 @@ class UnsubscribeAction(Base):
     manual_instructions = Column(String)
     
     # Timestamps
-    initiated_at = Column(DateTime, default=datetime.utcnow)
+    initiated_at = Column(DateTime, server_default=utc_now())
     completed_at = Column(DateTime)
     monitoring_until = Column(DateTime, index=True)
     
@@ -3,8 +3,7 @@ from sqlalchemy import Column, String, Integer, Boolean, DateTime, Numeric
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
-from app.database import Base
+from app.database import Base, utc_now
 
 
 class User(Base):
@@ -16,7 +15,7 @@ class User(Base):
     gmail_refresh_token = Column(String, nullable=False)  # Encrypted
     gmail_token_encrypted_at = Column(DateTime)
     profile_picture_url = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
     last_login_at = Column(DateTime)
     last_scan_at = Column(DateTime)
     subscription_count = Column(Integer, default=0)
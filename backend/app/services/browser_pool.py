@@ -0,0 +1,123 @@
+"""
+Headless Chromium pool for form-based cancellations
+Keeps a few browsers running and hands out a fresh context per cancellation
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+import logging
+
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """
+    Pool of long-lived Chromium browsers
+    
+    Launching Chromium takes hundreds of milliseconds and forks several
+    processes; a new BrowserContext on a running browser is cheap and just as
+    isolated (own cookies and storage). Browsers are launched on demand up to
+    `size` and replaced after `recycle_after` contexts to bound memory growth.
+    """
+    
+    def __init__(self, size: Optional[int] = None, recycle_after: Optional[int] = None):
+        self.size = size or settings.BROWSER_POOL_SIZE
+        self.recycle_after = recycle_after or settings.BROWSER_POOL_RECYCLE_AFTER
+        self._playwright: Optional[Playwright] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._uses: Dict[Browser, int] = {}
+        self._launched = 0
+        self._start_lock = asyncio.Lock()
+    
+    async def _ensure_started(self):
+        async with self._start_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+                self._idle = asyncio.Queue()
+                self._launched = 0
+    
+    async def _launch(self) -> Browser:
+        browser = await self._playwright.chromium.launch(headless=True)
+        self._uses[browser] = 0
+        return browser
+    
+    async def startup(self):
+        """Start Playwright and pre-launch all browsers"""
+        await self._ensure_started()
+        while self._launched < self.size:
+            self._launched += 1
+            try:
+                self._idle.put_nowait(await self._launch())
+            except Exception:
+                self._launched -= 1
+                raise
+    
+    async def _checkout(self) -> Browser:
+        await self._ensure_started()
+        
+        if self._idle.empty() and self._launched < self.size:
+            self._launched += 1
+            try:
+                return await self._launch()
+            except Exception:
+                self._launched -= 1
+                raise
+        
+        return await self._idle.get()
+    
+    async def _checkin(self, browser: Browser):
+        if self._playwright is None:
+            return  # Pool was shut down while the browser was in use
+        
+        self._uses[browser] = self._uses.get(browser, 0) + 1
+        if self._uses[browser] >= self.recycle_after or not browser.is_connected():
+            self._uses.pop(browser, None)
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing pooled browser: {e}")
+            
+            try:
+                browser = await self._launch()
+            except Exception as e:
+                logger.error(f"Failed to relaunch pooled browser: {e}")
+                self._launched -= 1
+                return
+        
+        self._idle.put_nowait(browser)
+    
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[BrowserContext]:
+        """Check out a browser and yield a fresh context on it (closed on exit)"""
+        browser = await self._checkout()
+        try:
+            context = await browser.new_context()
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            await self._checkin(browser)
+    
+    async def shutdown(self):
+        """Close all browsers and stop Playwright (call on application shutdown)"""
+        if self._playwright is None:
+            return
+        
+        for browser in list(self._uses):
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing pooled browser: {e}")
+        self._uses.clear()
+        
+        await self._playwright.stop()
+        self._playwright = None
+        self._idle = None
+        self._launched = 0
+        # Asyncio primitives bind to a loop; a restarted pool may run on another one
+        self._start_lock = asyncio.Lock()
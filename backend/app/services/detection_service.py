@@ -2,12 +2,20 @@
 Subscription detection and extraction service
 Combines rule-based patterns with LLM extraction
 """
+import asyncio
+import hashlib
 import re
-import json
-from typing import Dict, Optional, List, Any
+from collections import Counter
+from email.utils import parseaddr
+from typing import Dict, Optional, List, Any, Tuple
 from datetime import datetime
 import logging
 
+import httpx
+import orjson
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
 # Conditional imports for LLM providers
 try:
     from openai import AsyncOpenAI  # type: ignore[import-not-found]
@@ -22,15 +30,37 @@ except ImportError:
 from app.config import settings
 from app.utils.patterns import (
     PRICE_PATTERNS,
-    BILLING_PERIOD_PATTERNS,
+    BILLING_PERIOD_REGEXES,
     DATE_PATTERNS,
     UNSUBSCRIBE_LINK_PATTERNS,
-    SUBSCRIPTION_KEYWORDS
+    SUBSCRIPTION_KEYWORDS_ORDERED,
+    COMMON_SERVICE_RE
 )
 from app.utils.llm_prompt import build_extraction_prompt
+from app.utils.email_content import body_prefix
+from app.utils.json_stream import JsonObjectReader
+from app.utils.process_pool import get_process_pool
 
 logger = logging.getLogger(__name__)
 
+# Capitalized words (likely company names), for the service name fallback
+CAPITALIZED_WORD_RE = re.compile(r'\b[A-Z][a-z]+\b')
+
+# LLM responses wrapped in a markdown code block (```json ... ```)
+JSON_FENCE_RE = re.compile(r'\s*```(?:json)?\s*(.*?)\s*```\s*', re.DOTALL)
+
+# Body window for the rule-based field scans (plain text, HTML-only emails)
+RULE_SCAN_CHARS = 8 * 1024
+RULE_SCAN_HTML_CHARS = 64 * 1024
+
+# Unsubscribe links are searched in this many chars at each end of a long body
+LINK_SCAN_WINDOW_CHARS = 16 * 1024
+
+# LLM extraction fields that are cached. Per-email fields (renewal date,
+# unsubscribe link, card digits) are never cached: they may be specific to one
+# user, and the unsubscribe link is taken from the current email instead.
+LLM_CACHE_FIELDS = ('service_name', 'price', 'currency', 'billing_period', 'subscription_tier', 'confidence')
+
 
 class SubscriptionDetectionService:
     """Service for detecting and extracting subscription information"""
@@ -40,15 +70,48 @@ class SubscriptionDetectionService:
         self.openai_client = None
         self.anthropic_client = None
         self.model = settings.LLM_MODEL
+        # Keep-alive HTTP/2 transport shared by the provider SDK client, so
+        # concurrent extraction calls multiplex over a few warm connections
+        self.llm_http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        )
         
         if self.llm_provider == "openai":
             if AsyncOpenAI is None:
                 raise ImportError("openai package is not installed. Install it with: pip install openai")
-            self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=self.llm_http)
         elif self.llm_provider == "anthropic":
             if AsyncAnthropic is None:
                 raise ImportError("anthropic package is not installed. Install it with: pip install anthropic")
-            self.anthropic_client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+            self.anthropic_client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY, http_client=self.llm_http)
+        
+        self._cache: Optional[aioredis.Redis] = None
+        self._cache_loop: Optional[asyncio.AbstractEventLoop] = None
+        # LLM gate counters (llm_called / llm_skipped) per process, logged after each scan
+        self.stats: Counter = Counter()
+    
+    @property
+    def cache(self) -> aioredis.Redis:
+        """Redis client for the LLM extraction cache (bound to the running event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._cache is None or self._cache_loop is not loop:
+            self._cache = aioredis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=1
+            )
+            self._cache_loop = loop
+        return self._cache
+    
+    async def aclose(self):
+        """Close the LLM HTTP client and the Redis client (call on worker shutdown)"""
+        await self.llm_http.aclose()
+        
+        if self._cache is not None:
+            await self._cache.aclose()
+            self._cache = None
+            self._cache_loop = None
     
     async def detect_subscription(self, email_data: Dict) -> Optional[Dict]:
         """
@@ -60,72 +123,183 @@ class SubscriptionDetectionService:
         Returns:
             Extracted subscription data or None if not a subscription
         """
+        self._prepare(email_data)
+        
         # Stage 1: Check if email is subscription-related
         if not self._is_subscription_email(email_data):
-            logger.debug(f"Email {email_data['id']} not subscription-related (keyword check)")
+            logger.debug("Email %s not subscription-related (keyword check)", email_data['id'])
             return None
         
         # Stage 2: Try rule-based extraction first (fast & cheap)
         rule_result = await self._rule_based_extraction(email_data)
         
         if rule_result and rule_result.get('confidence', 0) >= 0.7:
-            logger.info(f"Email {email_data['id']} extracted via rules (confidence: {rule_result['confidence']})")
+            logger.info("Email %s extracted via rules (confidence: %s)", email_data['id'], rule_result['confidence'])
             rule_result['detected_by'] = 'rule_based'
             return rule_result
         
+        # Rules found no price/service: only worth an LLM call on a strong keyword signal
+        if rule_result is None:
+            min_hits = settings.LLM_MIN_KEYWORD_HITS
+            if self._count_keywords(email_data['_text_lower'], min_hits) < min_hits:
+                self.stats['llm_skipped'] += 1
+                logger.debug("Email %s skipped LLM (no rule fields, weak keyword signal)", email_data['id'])
+                return None
+        
         # Stage 3: Use LLM for complex extraction
-        logger.info(f"Email {email_data['id']} requires LLM extraction")
+        self.stats['llm_called'] += 1
+        logger.info("Email %s requires LLM extraction", email_data['id'])
         llm_result = await self._llm_extraction(email_data)
         
         if llm_result and llm_result.get('confidence', 0) >= settings.DETECTION_CONFIDENCE_THRESHOLD:
             llm_result['detected_by'] = 'llm'
             return llm_result
         
-        logger.debug(f"Email {email_data['id']} confidence too low ({llm_result.get('confidence', 0)})")
+        logger.debug("Email %s confidence too low (%s)", email_data['id'], (llm_result or {}).get('confidence', 0))
         return None
     
-    def _is_subscription_email(self, email_data: Dict) -> bool:
+    async def detect_subscriptions_batch(
+        self,
+        emails: List[Dict],
+        concurrency: Optional[int] = None
+    ) -> List[Optional[Dict]]:
         """
-        Quick check: Does email contain subscription-related keywords?
+        Run detect_subscription over many emails with overlapping LLM calls
+        
+        The keyword check runs first, synchronously, so only candidates are
+        dispatched; up to `concurrency` of them (LLM_MAX_CONCURRENCY by
+        default) are in flight at once over the shared LLM client.
+        
+        Returns:
+            One result (or None) per email, in input order
+        """
+        results: List[Optional[Dict]] = [None] * len(emails)
+        candidates = self.filter_candidates(emails)
+        
+        if not candidates:
+            return results
+        
+        await self._precompute_rule_fields([emails[i] for i in candidates])
+        
+        semaphore = asyncio.Semaphore(concurrency or settings.LLM_MAX_CONCURRENCY)
+        
+        async def detect(i: int):
+            async with semaphore:
+                results[i] = await self.detect_subscription(emails[i])
+        
+        await asyncio.gather(*(detect(i) for i in candidates))
+        return results
+    
+    def _prepare(self, email_data: Dict):
+        """
+        Build the text views the detection stages share, once per email
+        
+        Sets `_body_text_trunc` (first 2000 chars of the body, for the LLM),
+        `_text_lower` (lowercased subject, snippet and first 500 body chars,
+        for the keyword check) and `_sender_domain` (from the From header).
         """
-        text = (
+        if '_text_lower' in email_data:
+            return
+        
+        body_text_trunc = body_prefix(email_data, 'body_text', 2000)
+        email_data['_body_text_trunc'] = body_text_trunc
+        email_data['_text_lower'] = (
             email_data.get('subject', '') + ' ' +
             email_data.get('snippet', '') + ' ' +
-            email_data.get('body_text', '')[:500]  # First 500 chars
+            body_text_trunc[:500]
         ).lower()
-        
-        # Check for subscription keywords
-        keyword_count = sum(1 for kw in SUBSCRIPTION_KEYWORDS if kw in text)
-        
+        # parseaddr copes with "Name <user@domain>" headers
+        email_data['_sender_domain'] = parseaddr(email_data.get('from', ''))[1].rpartition('@')[2].lower()
+    
+    def filter_candidates(self, emails: List[Dict]) -> List[int]:
+        """
+        Stage 1 over a whole batch: indices of emails that pass the keyword check
+        """
+        candidates = []
+        for i, email_data in enumerate(emails):
+            self._prepare(email_data)
+            if self._is_subscription_email(email_data):
+                candidates.append(i)
+            else:
+                logger.debug("Email %s not subscription-related (keyword check)", email_data['id'])
+        return candidates
+    
+    def _is_subscription_email(self, email_data: Dict) -> bool:
+        """
+        Quick check: Does email contain subscription-related keywords?
+        """
         # Need at least 2 keywords to be considered subscription-related
-        return keyword_count >= 2
+        return self._count_keywords(email_data['_text_lower'], 2) >= 2
+    
+    @staticmethod
+    def _count_keywords(text: str, stop_at: int) -> int:
+        """
+        Number of subscription keywords in (lowercased) text, counting no
+        further than `stop_at`
+        """
+        # Each `in` is a C-level substring search; stop once the caller has enough
+        keyword_count = 0
+        for kw in SUBSCRIPTION_KEYWORDS_ORDERED:
+            if kw in text:
+                keyword_count += 1
+                if keyword_count >= stop_at:
+                    break
+        
+        return keyword_count
     
     async def _rule_based_extraction(self, email_data: Dict) -> Optional[Dict]:
         """
         Extract subscription data using regex patterns
+        
+        Uses the fields detect_subscriptions_batch precomputed off the event
+        loop when present.
+        """
+        rule_fields = email_data.pop('_rule_fields', None)
+        if rule_fields is None:
+            rule_fields = self._rule_based_fields(email_data)
+        result, price = rule_fields
+        
+        # Kept for the LLM stage's cache key and cache hits
+        email_data['_rule_price'] = price
+        if result is not None:
+            email_data['_rule_unsubscribe_link'] = result['unsubscribe_link']
+        return result
+    
+    @staticmethod
+    def _rule_based_fields(email_data: Dict) -> Tuple[Optional[Dict], Optional[float]]:
         """
-        text = email_data.get('body_text', '') or email_data.get('body_html', '')
+        Regex extraction proper (pure, so it can run in a worker process or thread)
+        
+        The cheap fields come first; the unsubscribe link scan, which also
+        covers the HTML part, only runs once price and service name are found.
+        
+        Returns: (subscription data or None, price)
+        """
+        text = SubscriptionDetectionService._scan_text(email_data)
         subject = email_data.get('subject', '')
-        sender = email_data.get('from', '')
         
         # Extract fields
-        price = self._extract_price(text)
-        currency = self._extract_currency(text)
-        billing_period = self._extract_billing_period(text)
-        renewal_date = self._extract_date(text)
-        unsubscribe_link = self._extract_unsubscribe_link(text + email_data.get('body_html', ''))
-        service_name = self._extract_service_name(subject, sender, text)
+        price = SubscriptionDetectionService._extract_price(text)
+        
+        # Need a price for valid detection; skip the remaining scans without one
+        if not price:
+            return None, price
+        
+        service_name = SubscriptionDetectionService._extract_service_name(subject, email_data['_sender_domain'], text)
+        if not service_name:
+            return None, price
+        
+        unsubscribe_link = SubscriptionDetectionService._find_unsubscribe_link(email_data)
+        currency = SubscriptionDetectionService._extract_currency(text)
+        billing_period = SubscriptionDetectionService._extract_billing_period(text)
+        renewal_date = SubscriptionDetectionService._extract_date(text)
         
         # Calculate confidence based on how many required fields were found
         required_fields = [price, billing_period, unsubscribe_link, service_name]
         found_fields = sum(1 for field in required_fields if field)
-        confidence = found_fields / len(required_fields) if required_fields else 0
+        confidence = found_fields / len(required_fields)
         
-        # Need at least service name and price for valid detection
-        if not service_name or not price:
-            return None
-        
-        return {
+        result = {
             "service_name": service_name,
             "price": price,
             "currency": currency or "USD",
@@ -136,21 +310,58 @@ class SubscriptionDetectionService:
             "source_email_id": email_data['id'],
             "detection_method": "rule_based"
         }
+        return result, price
+    
+    async def _precompute_rule_fields(self, emails: List[Dict]):
+        """
+        Run the regex stage for a whole batch off the event loop
+        
+        Results are stored on each email for _rule_based_extraction. The
+        shared process pool is used when there is one; Celery prefork workers
+        (where scans run) are daemonic and get none, so there the batch runs
+        in a thread instead. That does not add CPU, but keeps the loop free
+        for the Gmail fetches and list calls prefetching in the background.
+        """
+        if len(emails) < 2:
+            return
+        
+        pool = get_process_pool()
+        if pool is None:
+            results = await asyncio.to_thread(_rule_based_many, emails)
+        else:
+            # Only plain, picklable fields cross the process boundary
+            fields = [
+                {
+                    'id': email_data['id'],
+                    'subject': email_data.get('subject', ''),
+                    'body_text': email_data.get('body_text', ''),
+                    'body_html': email_data.get('body_html', ''),
+                    '_sender_domain': email_data['_sender_domain'],
+                }
+                for email_data in emails
+            ]
+            
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(pool, _rule_based_many, fields)
+        
+        for email_data, rule_fields in zip(emails, results):
+            email_data['_rule_fields'] = rule_fields
     
-    def _extract_price(self, text: str) -> Optional[float]:
+    @staticmethod
+    def _extract_price(text: str) -> Optional[float]:
         """Extract price using regex patterns"""
         for pattern in PRICE_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
                 try:
                     # Extract numeric value
-                    price_str = match.group(1).replace(',', '')
-                    return float(price_str)
-                except:
+                    return float(match.group(1).replace(',', ''))
+                except ValueError:
                     continue
         return None
     
-    def _extract_currency(self, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_currency(text: str) -> Optional[str]:
         """Extract currency code"""
         # Check for currency symbols/codes
         if '$' in text:
@@ -161,98 +372,156 @@ class SubscriptionDetectionService:
             return 'GBP'
         return None
     
-    def _extract_billing_period(self, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_billing_period(text: str) -> Optional[str]:
         """Extract billing frequency"""
-        text_lower = text.lower()
-        
-        for period, patterns in BILLING_PERIOD_PATTERNS.items():
-            if any(re.search(pattern, text_lower) for pattern in patterns):
+        for period, pattern in BILLING_PERIOD_REGEXES:
+            if pattern.search(text):
                 return period
         
         return None
     
-    def _extract_date(self, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_date(text: str) -> Optional[str]:
         """Extract renewal date"""
         for pattern in DATE_PATTERNS:
-            match = re.search(pattern, text)
+            match = pattern.search(text)
             if match:
-                try:
-                    # Try to parse various date formats
-                    date_str = match.group(0)
-                    # This is simplified - in production, use dateutil.parser
-                    return date_str
-                except:
-                    continue
+                # This is simplified - in production, use dateutil.parser
+                return match.group(0)
         return None
     
-    def _extract_unsubscribe_link(self, text: str) -> Optional[str]:
-        """Extract unsubscribe/cancel link"""
+    @staticmethod
+    def _scan_text(email_data: Dict) -> str:
+        """
+        Body window the rule-based extractors scan
+        
+        Receipt fields sit near the top of the body; the rest is mostly legal
+        text and tracking markup. HTML-only emails get a larger window since
+        a <style> block can come before any content.
+        """
+        body_text = email_data.get('body_text', '')
+        if body_text:
+            return body_text[:RULE_SCAN_CHARS]
+        return email_data.get('body_html', '')[:RULE_SCAN_HTML_CHARS]
+    
+    @staticmethod
+    def _find_unsubscribe_link(email_data: Dict) -> Optional[str]:
+        """Unsubscribe link from the body text, then the HTML part"""
+        body_html = email_data.get('body_html', '')
+        text = email_data.get('body_text', '') or body_html
+        # Links often only appear in the HTML part; search it too unless it is already `text`
+        link_sources = (text,) if text is body_html else (text, body_html)
+        
+        # Links sit in the header or the footer; scan both ends of long bodies
+        windows = []
+        for source in link_sources:
+            if len(source) <= 2 * LINK_SCAN_WINDOW_CHARS:
+                windows.append(source)
+            else:
+                windows.extend((source[:LINK_SCAN_WINDOW_CHARS], source[-LINK_SCAN_WINDOW_CHARS:]))
+        return SubscriptionDetectionService._extract_unsubscribe_link(*windows)
+    
+    @staticmethod
+    def _extract_unsubscribe_link(*texts: str) -> Optional[str]:
+        """Extract unsubscribe/cancel link (searches each text in turn, without concatenating)"""
         for pattern in UNSUBSCRIBE_LINK_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(0)
+            for text in texts:
+                match = pattern.search(text)
+                if match:
+                    return match.group(0)
         return None
     
-    def _extract_service_name(self, subject: str, sender: str, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_service_name(subject: str, sender_domain: str, text: str) -> Optional[str]:
         """
         Extract service name from email
         Priority: subject > sender domain > body text
         """
         # Try to extract from subject
-        subject_lower = subject.lower()
-        common_services = [
-            'netflix', 'spotify', 'hulu', 'disney', 'amazon prime',
-            'dropbox', 'google', 'microsoft', 'adobe', 'apple',
-            'youtube', 'linkedin', 'github', 'slack', 'zoom'
-        ]
-        
-        for service in common_services:
-            if service in subject_lower:
-                return service.title()
+        match = COMMON_SERVICE_RE.search(subject)
+        if match:
+            return match.group(0).lower().title()
         
         # Try to extract from sender domain
-        if '@' in sender:
-            domain = sender.split('@')[1].split('.')[0]
-            return domain.title()
+        if sender_domain:
+            return sender_domain.partition('.')[0].title()
         
         # Fallback: Look for capitalized words in text (company names)
-        words = re.findall(r'\b[A-Z][a-z]+\b', text[:200])
-        if words:
-            return words[0]
+        word = CAPITALIZED_WORD_RE.search(text, 0, 200)
+        if word:
+            return word.group(0)
         
         return "Unknown Service"
     
+    def _llm_cache_key(self, email_data: Dict, prompt: str) -> Optional[str]:
+        """
+        Cache key for an extraction: sender domain, rule-extracted price and
+        a hash of the exact prompt sent, so only identical emails share it
+        
+        None (no caching) when the rules found no price: those are the least
+        template-like emails and the ones most likely to collide.
+        """
+        price = email_data.get('_rule_price')
+        if price is None:
+            return None
+        
+        raw_key = '\x1f'.join((
+            self.llm_provider, self.model, email_data['_sender_domain'], f"{price:.2f}", prompt
+        ))
+        return f"llm:extract:{hashlib.sha256(raw_key.encode()).hexdigest()[:32]}"
+    
+    async def _cache_get(self, key: str) -> Optional[Dict]:
+        """Read a cached JSON value; cache failures are treated as misses"""
+        try:
+            cached = await self.cache.get(key)
+        except RedisError as e:
+            logger.debug(f"LLM cache read failed: {e}")
+            return None
+        return orjson.loads(cached) if cached else None
+    
+    async def _cache_set(self, key: str, value: Dict, ttl: int):
+        """Store a JSON value with a TTL; cache failures are ignored"""
+        try:
+            await self.cache.setex(key, ttl, orjson.dumps(value))
+        except RedisError as e:
+            logger.debug(f"LLM cache write failed: {e}")
+    
     async def _llm_extraction(self, email_data: Dict) -> Optional[Dict]:
         """
         Use LLM (GPT-4 or Claude) to extract subscription data
-        """
-        # Build prompt
-        email_text = f"""
-Subject: {email_data['subject']}
-From: {email_data['from']}
-
-{email_data['body_text'][:2000]}
-"""
         
-        prompt = build_extraction_prompt(email_data['subject'], email_data['body_text'][:2000])
+        An email whose prompt (subject and body prefix), sender domain and
+        rule price match an earlier one reuses its cached extraction instead
+        of another LLM call.
+        """
+        prompt = build_extraction_prompt(email_data['subject'], email_data['_body_text_trunc'])
+        cache_key = self._llm_cache_key(email_data, prompt)
         
         try:
-            if self.llm_provider == "openai":
-                response = await self._call_openai(prompt)
-            else:
-                response = await self._call_anthropic(prompt)
-            
-            # Parse JSON response - remove markdown code blocks if present
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
+            extracted_data = await self._cache_get(cache_key) if cache_key else None
             
-            extracted_data = json.loads(response)
+            if extracted_data is not None:
+                logger.debug("Email %s LLM extraction served from cache", email_data['id'])
+                if '_rule_unsubscribe_link' not in email_data:
+                    email_data['_rule_unsubscribe_link'] = self._find_unsubscribe_link(email_data)
+                extracted_data['unsubscribe_link'] = email_data['_rule_unsubscribe_link']
+            else:
+                if self.llm_provider == "openai":
+                    response = await self._call_openai(prompt)
+                else:
+                    response = await self._call_anthropic(prompt)
+                
+                # Parse JSON response - unwrap a markdown code block if present
+                fenced = JSON_FENCE_RE.fullmatch(response)
+                extracted_data = orjson.loads(fenced.group(1) if fenced else response)
+                
+                if cache_key:
+                    await self._cache_set(
+                        cache_key,
+                        {field: extracted_data.get(field) for field in LLM_CACHE_FIELDS},
+                        settings.LLM_CACHE_TTL
+                    )
             
             # Validate extracted data
             if self._validate_extraction(extracted_data, email_data):
@@ -260,7 +529,7 @@ From: {email_data['from']}
                 extracted_data['detection_method'] = 'llm'
                 return extracted_data
         
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse LLM response as JSON: {e}")
         except Exception as e:
             logger.error(f"LLM extraction error: {e}")
@@ -268,28 +537,55 @@ From: {email_data['from']}
         return None
     
     async def _call_openai(self, prompt: str) -> str:
-        """Call OpenAI API"""
+        """
+        Call OpenAI API
+        
+        The response is streamed and returned as soon as the JSON object is
+        complete; anything the model writes after it is never waited for.
+        """
         if self.openai_client is None:
             raise RuntimeError("OpenAI client not initialized. Check that openai package is installed.")
-        response = await self.openai_client.chat.completions.create(
+        stream = await self.openai_client.chat.completions.create(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
             temperature=settings.LLM_TEMPERATURE,
-            max_tokens=settings.LLM_MAX_TOKENS
+            max_tokens=settings.LLM_MAX_TOKENS,
+            stream=True
         )
-        return response.choices[0].message.content.strip()
+        
+        reader = JsonObjectReader()
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                
+                extracted = reader.feed(delta)
+                if extracted is not None:
+                    return extracted
+        finally:
+            # Stops generation if we return before the stream is exhausted
+            await stream.response.aclose()
+        
+        return reader.text().strip()
     
     async def _call_anthropic(self, prompt: str) -> str:
-        """Call Anthropic API"""
+        """Call Anthropic API (streamed, like _call_openai)"""
         if self.anthropic_client is None:
             raise RuntimeError("Anthropic client not initialized. Check that anthropic package is installed.")
-        message = await self.anthropic_client.messages.create(
+        reader = JsonObjectReader()
+        async with self.anthropic_client.messages.stream(
             model=self.model,
             max_tokens=settings.LLM_MAX_TOKENS,
             temperature=settings.LLM_TEMPERATURE,
             messages=[{"role": "user", "content": prompt}]
-        )
-        return message.content[0].text.strip()
+        ) as stream:
+            async for delta in stream.text_stream:
+                extracted = reader.feed(delta)
+                if extracted is not None:
+                    return extracted
+        
+        return reader.text().strip()
     
     def _validate_extraction(self, extracted: Dict, email_data: Dict) -> bool:
         """
@@ -314,9 +610,8 @@ From: {email_data['from']}
                 extracted['confidence'] = max(0, extracted.get('confidence', 0.5) - 0.3)
         
         # Validate domain match
-        sender = email_data.get('from', '')
-        if '@' in sender and unsub_link:
-            sender_domain = sender.split('@')[1]
+        sender_domain = email_data.get('_sender_domain', '')
+        if sender_domain and unsub_link:
             if sender_domain not in unsub_link:
                 logger.warning(f"Domain mismatch: {sender_domain} not in {unsub_link}")
                 extracted['confidence'] = max(0, extracted.get('confidence', 0.5) - 0.2)
@@ -324,6 +619,11 @@ From: {email_data['from']}
         return True
 
 
+def _rule_based_many(emails: List[Dict]) -> List[Tuple[Optional[Dict], Optional[float]]]:
+    """Regex stage over a batch of email dicts (process pool / thread entry point)"""
+    return [SubscriptionDetectionService._rule_based_fields(email_data) for email_data in emails]
+
+
 # Global instance
 detection_service = SubscriptionDetectionService()
 
@@ -2,32 +2,393 @@
 Gmail API integration service
 Handles OAuth flow, token management, and email fetching
 """
-import base64
 import asyncio
+import hashlib
+import uuid
+from functools import lru_cache
+from email import policy as email_policy
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
 from typing import List, Dict, Optional, AsyncGenerator, Tuple
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 import logging
+import time
 
-from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from fastapi import Request
 import httpx
+import orjson
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 
 from app.config import settings
-from app.utils.encryption import encrypt_token, decrypt_token
+from app.utils.encryption import decrypt_token, get_fernet
+from app.utils.email_content import EmailContent, LazyBody, b64url_decode
+from app.utils.process_pool import get_process_pool
+from app.utils.rate_limit import TokenBucket, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+GOOGLE_AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+GOOGLE_USER_INFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_ID_TOKEN_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+GMAIL_API_BASE = "https://gmail.googleapis.com/gmail/v1/users/me"
+GMAIL_BATCH_URL = "https://www.googleapis.com/batch/gmail/v1"
+GMAIL_BATCH_LIMIT = 100  # Max sub-requests per batch call
+
+# Gmail quota cost (units) per call
+MESSAGES_LIST_COST = 5
+MESSAGES_GET_COST = 5
+
+# Header-only fetches: skip MIME bodies and trim the JSON response
+METADATA_HEADERS = ['From', 'To', 'Subject', 'Date']
+METADATA_FIELDS = 'id,threadId,labelIds,snippet,internalDate,payload/headers'
+
+# messages.list only needs IDs and paging info
+LIST_FIELDS = 'messages(id,threadId),nextPageToken,resultSizeEstimate'
+
+# format=raw fetches (RFC 822 source parsed locally)
+RAW_FIELDS = 'id,threadId,labelIds,snippet,internalDate,raw'
+
+# Transient statuses from Google endpoints that are retried with backoff
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Cached access tokens this close to expiry are refreshed in the background
+TOKEN_REFRESH_MARGIN = 300  # Seconds
+MAX_CACHED_ACCESS_TOKENS = 256
+
+# Headers read by extract_email_content
+EXTRACTED_HEADERS = frozenset(METADATA_HEADERS)
+
+
+def _message_date(internal_date: Optional[str], date_header: Optional[str]) -> Optional[datetime]:
+    """Message timestamp: internalDate (epoch ms) needs no parsing, Date header is the fallback"""
+    if internal_date:
+        return datetime.fromtimestamp(int(internal_date) / 1000, tz=timezone.utc)
+    if date_header:
+        try:
+            return parsedate_to_datetime(str(date_header))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _after_clause(after_ordinal: Optional[int]) -> str:
+    """' after:YYYY/MM/DD' search clause for a date ordinal ('' when None)"""
+    if after_ordinal is None:
+        return ""
+    
+    day = date.fromordinal(after_ordinal)
+    return f" after:{day.year:04d}/{day.month:02d}/{day.day:02d}"
+
+
+@lru_cache(maxsize=4096)
+def _sender_query(sender_domain: str, after_ordinal: Optional[int]) -> str:
+    """Gmail search query for a sender domain, optionally limited to after a date"""
+    return f"from:@{sender_domain}{_after_clause(after_ordinal)}"
+
+
+class GmailBatchItemError(RuntimeError):
+    """A single sub-request of a Gmail batch call returned a non-200 status"""
+    
+    def __init__(self, message_id: str, status: int, body: bytes):
+        super().__init__(f"Error fetching email {message_id}: HTTP {status} {body[:200]!r}")
+        self.message_id = message_id
+        self.status = status
+        # 429, or 403 with a rate-limit reason, means retry later
+        self.rate_limited = status == 429 or (
+            status == 403
+            and (b"rateLimitExceeded" in body or b"userRateLimitExceeded" in body)
+        )
+        # 5xx and unreadable/missing parts (status 0) are transient too
+        self.retryable = self.rate_limited or status == 0 or status in RETRYABLE_STATUS_CODES
+
+
+def extract_email_content(message: Dict) -> Dict:
+    """
+    Extract useful content from Gmail message object
+    
+    Returns:
+        {
+            "id": "...",
+            "date": datetime,
+            "from": "sender@example.com",
+            "subject": "...",
+            "snippet": "...",
+            "body_text": "...",
+            "body_html": "..."
+        }
+    
+    body_text/body_html are decoded lazily on first access.
+    """
+    if 'raw' in message:
+        return _extract_raw_email_content(message)
+    
+    payload = message['payload']
+    
+    # Extract headers (single pass, only the ones we use; stops once all are found)
+    headers = {}
+    for header in payload.get('headers', ()):
+        name = header['name']
+        if name in EXTRACTED_HEADERS and name not in headers:
+            headers[name] = header['value']
+            if len(headers) == len(EXTRACTED_HEADERS):
+                break
+    
+    date = _message_date(message.get('internalDate'), headers.get('Date'))
+    
+    # Extract body: collect base64 data per MIME type; decoding is deferred
+    # until a body is actually read (see EmailContent)
+    text_chunks: List[str] = []
+    html_chunks: List[str] = []
+    
+    # Check if body is directly in payload
+    if payload.get('body', {}).get('data'):
+        text_chunks.append(payload['body']['data'])
+    
+    # Or walk the MIME tree iteratively (pre-order, same order as the parts)
+    else:
+        stack = list(reversed(payload.get('parts', ())))
+        while stack:
+            part = stack.pop()
+            data = part.get('body', {}).get('data')
+            
+            if data:
+                mime_type = part.get('mimeType', '')
+                if mime_type == 'text/plain':
+                    text_chunks.append(data)
+                elif mime_type == 'text/html':
+                    html_chunks.append(data)
+            
+            if 'parts' in part:
+                stack.extend(reversed(part['parts']))
+    
+    return EmailContent(
+        {
+            "id": message['id'],
+            "thread_id": message.get('threadId'),
+            "date": date,
+            "from": headers.get('From', ''),
+            "to": headers.get('To', ''),
+            "subject": headers.get('Subject', ''),
+            "snippet": message.get('snippet', ''),
+            "labels": message.get('labelIds', [])
+        },
+        {
+            "body_text": LazyBody(text_chunks),
+            "body_html": LazyBody(html_chunks)
+        }
+    )
+
+
+def _extract_raw_email_content(message: Dict) -> Dict:
+    """
+    Extract content from a format=raw message using the stdlib MIME parser
+    
+    Returns the same shape as extract_email_content. Attachments are
+    skipped; text parts are decoded with their declared charset.
+    """
+    mime = BytesParser(policy=email_policy.default).parsebytes(b64url_decode(message['raw']))
+    
+    text_parts: List[str] = []
+    html_parts: List[str] = []
+    for part in mime.walk():
+        if part.is_multipart() or part.get_content_disposition() == 'attachment':
+            continue
+        
+        content_type = part.get_content_type()
+        if content_type not in ('text/plain', 'text/html'):
+            continue
+        
+        try:
+            content = part.get_content()
+        except (LookupError, ValueError) as e:
+            logger.debug(f"Skipping undecodable part in {message.get('id')}: {e}")
+            continue
+        
+        (text_parts if content_type == 'text/plain' else html_parts).append(content)
+    
+    return {
+        "id": message['id'],
+        "thread_id": message.get('threadId'),
+        "date": _message_date(message.get('internalDate'), mime.get('Date')),
+        "from": str(mime.get('From', '')),
+        "to": str(mime.get('To', '')),
+        "subject": str(mime.get('Subject', '')),
+        "snippet": message.get('snippet', ''),
+        "body_text": "".join(text_parts),
+        "body_html": "".join(html_parts),
+        "labels": message.get('labelIds', [])
+    }
+
+
+def _extract_many(messages: List[Dict]) -> List:
+    """extract_email_content over a batch; failures are returned as exceptions"""
+    results = []
+    for message in messages:
+        try:
+            results.append(extract_email_content(message))
+        except Exception as e:
+            results.append(e)
+    return results
+
 
 class GmailService:
     """Service for interacting with Gmail API"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[aioredis.Redis] = None):
         self.scopes = settings.GMAIL_SCOPES
         self.client_id = settings.GOOGLE_CLIENT_ID
         self.client_secret = settings.GOOGLE_CLIENT_SECRET
         self.redirect_uri = settings.GOOGLE_REDIRECT_URI
+        self._client_config = {
+            "web": {
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "auth_uri": GOOGLE_AUTH_URI,
+                "token_uri": GOOGLE_TOKEN_URI,
+                "redirect_uris": [self.redirect_uri],
+            }
+        }
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._quota_buckets: Dict[str, TokenBucket] = {}
+        # Refresh-token key -> (access token, time.monotonic() expiry), and refreshes in flight
+        self._access_tokens: Dict[str, Tuple[str, float]] = {}
+        self._token_refreshes: Dict[str, asyncio.Task] = {}
+        # Injected by the API lifespan (app.state.redis); otherwise created per event loop
+        self._cache = cache
+        self._cache_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _quota(self, access_token: str) -> TokenBucket:
+        """Per-user token bucket sized to Gmail's per-user quota units/second"""
+        bucket = self._quota_buckets.get(access_token)
+        if bucket is None:
+            # Access tokens rotate hourly; drop the oldest buckets to stay bounded
+            if len(self._quota_buckets) >= 256:
+                self._quota_buckets.pop(next(iter(self._quota_buckets)))
+            bucket = TokenBucket(settings.GMAIL_API_QUOTA_PER_USER)
+            self._quota_buckets[access_token] = bucket
+        return bucket
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        Shared keep-alive HTTP/2 client for Google endpoints
+        
+        Pooled connections are bound to the event loop that opened them, so a
+        new client is created when called from a different loop (e.g. each
+        Celery worker thread's loop, see worker.tasks.run_async).
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            )
+            self._http_loop = loop
+        return self._http
+    
+    @property
+    def cache(self) -> aioredis.Redis:
+        """Redis client for short-lived Gmail response caching (loop-bound, like http)"""
+        if self._cache is not None and self._cache_loop is None:
+            return self._cache
+        
+        loop = asyncio.get_running_loop()
+        if self._cache is None or self._cache_loop is not loop:
+            self._cache = aioredis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=1
+            )
+            self._cache_loop = loop
+        return self._cache
+    
+    async def startup(self):
+        """Open the shared HTTP and Redis clients on the running event loop"""
+        # The properties create both clients bound to the current loop
+        _ = self.http, self.cache
+        # Build the token cipher up front rather than on the first OAuth callback
+        get_fernet()
+    
+    async def aclose(self):
+        """Close the shared HTTP client and a self-created Redis client (call on application shutdown)"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._http_loop = None
+        
+        if self._cache is not None and self._cache_loop is not None:
+            await self._cache.aclose()
+            self._cache = None
+            self._cache_loop = None
+    
+    @staticmethod
+    def _token_key(token: str) -> str:
+        """Stable, non-reversible cache key component for an OAuth token"""
+        return hashlib.sha256(token.encode()).hexdigest()[:32]
+    
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        max_retries: Optional[int] = None,
+        retry_transport_errors: bool = True,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request to a Google endpoint, retrying transient failures
+        
+        429/5xx responses (and 403 rate-limit errors) are retried with
+        exponential backoff, honoring Retry-After, up to max_retries times
+        (default GMAIL_MAX_RETRIES); the last response is returned either
+        way. Connection errors are retried too unless retry_transport_errors
+        is False, for requests that must not be replayed once sent.
+        """
+        if max_retries is None:
+            max_retries = settings.GMAIL_MAX_RETRIES
+        
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if not retry_transport_errors or attempt >= max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"Google request failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                retryable = response.status_code in RETRYABLE_STATUS_CODES or (
+                    response.status_code == 403
+                    and (b"rateLimitExceeded" in response.content or b"userRateLimitExceeded" in response.content)
+                )
+                if not retryable or attempt >= max_retries:
+                    return response
+                delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"Google returned HTTP {response.status_code}, retrying in {delay:.1f}s")
+            
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    async def _cache_get(self, key: str) -> Optional[Dict]:
+        """Read a cached JSON value; cache failures are treated as misses"""
+        try:
+            cached = await self.cache.get(key)
+        except RedisError as e:
+            logger.debug(f"Gmail cache read failed: {e}")
+            return None
+        return orjson.loads(cached) if cached else None
+    
+    async def _cache_set(self, key: str, value: Dict, ttl: int):
+        """Store a JSON value with a TTL; cache failures are ignored"""
+        try:
+            await self.cache.setex(key, ttl, orjson.dumps(value))
+        except RedisError as e:
+            logger.debug(f"Gmail cache write failed: {e}")
     
     def create_oauth_flow(self) -> Tuple[str, str]:
         """
@@ -35,15 +396,7 @@ class GmailService:
         Returns: (auth_url, state)
         """
         flow = Flow.from_client_config(
-            client_config={
-                "web": {
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "redirect_uris": [self.redirect_uri],
-                }
-            },
+            client_config=self._client_config,
             scopes=self.scopes,
             redirect_uri=self.redirect_uri
         )
@@ -74,115 +427,210 @@ class GmailService:
     
     async def _exchange_code_direct(self, code: str) -> Dict:
         """Direct HTTP request to Google token endpoint"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Prepare token exchange request
-            # redirect_uri MUST match exactly what was used in authorization URL
-            token_request_data = {
-                "code": code,
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "redirect_uri": self.redirect_uri,  # Critical: must match auth URL exactly
-                "grant_type": "authorization_code",
-            }
-            
-            logger.debug(f"Token request data keys: {list(token_request_data.keys())}")
-            logger.debug(f"Redirect URI being sent: '{token_request_data['redirect_uri']}'")
-            
-            response = await client.post(
-                "https://oauth2.googleapis.com/token",
-                data=token_request_data,
-                headers={"Content-Type": "application/x-www-form-urlencoded"}
-            )
-            
-            # Log full response for debugging
-            logger.info(f"Token exchange response status: {response.status_code}")
+        # Prepare token exchange request
+        # redirect_uri MUST match exactly what was used in authorization URL
+        token_request_data = {
+            "code": code,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "redirect_uri": self.redirect_uri,  # Critical: must match auth URL exactly
+            "grant_type": "authorization_code",
+        }
+        
+        logger.debug(f"Token request data keys: {list(token_request_data.keys())}")
+        logger.debug(f"Redirect URI being sent: '{token_request_data['redirect_uri']}'")
+        
+        # The code is single-use: a dropped connection may already have redeemed it, so only
+        # error responses are retried (briefly, the user is waiting on the callback)
+        response = await self._send(
+            "POST",
+            GOOGLE_TOKEN_URI,
+            max_retries=2,
+            retry_transport_errors=False,
+            data=token_request_data,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=30.0
+        )
+        
+        # Log full response for debugging
+        logger.info(f"Token exchange response status: {response.status_code}")
+        
+        if response.status_code != 200:
+            error_text = response.text
+            logger.error(f"Token exchange failed - Status: {response.status_code}")
+            logger.error(f"Error response: {error_text}")
+            logger.error(f"Request redirect_uri: '{self.redirect_uri}'")
+            logger.error(f"Request client_id: {self.client_id}")
             
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"Token exchange failed - Status: {response.status_code}")
-                logger.error(f"Error response: {error_text}")
-                logger.error(f"Request redirect_uri: '{self.redirect_uri}'")
-                logger.error(f"Request client_id: {self.client_id}")
+            try:
+                error_json = orjson.loads(response.content)
+                error_description = error_json.get("error_description", "Unknown error")
+                error_code = error_json.get("error", "unknown")
+                error_msg = f"({error_code}) {error_description}"
                 
-                try:
-                    error_json = response.json()
-                    error_description = error_json.get("error_description", "Unknown error")
-                    error_code = error_json.get("error", "unknown")
-                    error_msg = f"({error_code}) {error_description}"
-                    
-                    # Provide more helpful error messages
-                    if "redirect_uri_mismatch" in error_description.lower() or error_code == "redirect_uri_mismatch":
-                        error_msg += f". Ensure redirect URI '{self.redirect_uri}' matches exactly in Google Cloud Console."
-                    elif "invalid_grant" in error_code.lower():
-                        error_msg += ". This usually means the authorization code was already used or expired. Start a fresh OAuth flow."
-                    
-                    logger.error(f"Parsed error: {error_msg}")
-                    raise ValueError(error_msg)
-                except (ValueError, KeyError, Exception) as parse_error:
-                    # If JSON parsing fails, use raw text
-                    logger.error(f"Could not parse error as JSON: {parse_error}")
-                    raise ValueError(f"Token exchange failed: {error_text}")
-            
-            token_data = response.json()
-            access_token = token_data.get("access_token")
-            refresh_token = token_data.get("refresh_token")
-            
-            if not access_token:
-                raise ValueError("No access token received in response")
-            
-            if not refresh_token:
-                raise ValueError("No refresh token received. Make sure 'prompt=consent' is used in authorization URL to get a refresh token.")
-            
-            # Get user info
+                # Provide more helpful error messages
+                if "redirect_uri_mismatch" in error_description.lower() or error_code == "redirect_uri_mismatch":
+                    error_msg += f". Ensure redirect URI '{self.redirect_uri}' matches exactly in Google Cloud Console."
+                elif "invalid_grant" in error_code.lower():
+                    error_msg += ". This usually means the authorization code was already used or expired. Start a fresh OAuth flow."
+                
+                logger.error(f"Parsed error: {error_msg}")
+                raise ValueError(error_msg)
+            except (ValueError, KeyError, Exception) as parse_error:
+                # If JSON parsing fails, use raw text
+                logger.error(f"Could not parse error as JSON: {parse_error}")
+                raise ValueError(f"Token exchange failed: {error_text}")
+        
+        token_data = orjson.loads(response.content)
+        access_token = token_data.get("access_token")
+        refresh_token = token_data.get("refresh_token")
+        
+        if not access_token:
+            raise ValueError("No access token received in response")
+        
+        if not refresh_token:
+            raise ValueError("No refresh token received. Make sure 'prompt=consent' is used in authorization URL to get a refresh token.")
+        
+        # Get user info: the id_token already carries it, userinfo is the fallback
+        user_info = self._user_info_from_id_token(token_data.get("id_token"))
+        if user_info is None:
             user_info = await self._get_user_info(access_token)
-            
-            logger.info(f"Token exchange successful for user: {user_info.get('email')}")
-            
-            return {
-                "access_token": access_token,
-                "refresh_token": refresh_token,
-                "user_info": user_info
-            }
+        
+        logger.info(f"Token exchange successful for user: {user_info.get('email')}")
+        
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "user_info": user_info
+        }
+    
+    def _user_info_from_id_token(self, id_token: Optional[str]) -> Optional[Dict]:
+        """
+        Read profile claims from the id_token returned by the token endpoint
+        
+        The token came straight from Google over TLS in our own request, so per
+        OpenID Connect Core 3.1.3.7 the signature check can be skipped; the
+        audience, issuer and expiry are still validated. Returns None if the
+        token is missing or unusable so the caller can fall back to userinfo.
+        """
+        if not id_token:
+            return None
+        
+        try:
+            payload = id_token.split(".")[1]
+            claims = orjson.loads(b64url_decode(payload))
+        except (IndexError, ValueError) as e:
+            logger.warning(f"Could not decode id_token: {e}")
+            return None
+        
+        if (
+            claims.get("aud") != self.client_id
+            or claims.get("iss") not in GOOGLE_ID_TOKEN_ISSUERS
+            or claims.get("exp", 0) < datetime.now(timezone.utc).timestamp()
+            or not claims.get("email")
+        ):
+            logger.warning("id_token failed claim validation, falling back to userinfo")
+            return None
+        
+        return {
+            "id": claims.get("sub"),
+            "email": claims["email"],
+            "verified_email": claims.get("email_verified"),
+            "name": claims.get("name"),
+            "picture": claims.get("picture"),
+        }
     
     async def _get_user_info(self, access_token: str) -> Dict:
-        """Fetch user profile info from Google"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://www.googleapis.com/oauth2/v2/userinfo",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            response.raise_for_status()
-            return response.json()
+        """Fetch user profile info from Google (cached per access token)"""
+        cache_key = f"gmail:userinfo:{self._token_key(access_token)}"
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await self.http.get(
+            GOOGLE_USER_INFO_URL,
+            headers=self._auth_headers(access_token)
+        )
+        response.raise_for_status()
+        user_info = orjson.loads(response.content)
+        
+        await self._cache_set(cache_key, user_info, settings.GMAIL_USER_INFO_CACHE_TTL)
+        return user_info
     
-    def get_gmail_service(self, access_token: str):
-        """Create Gmail API service client"""
-        credentials = Credentials(token=access_token)
-        return build('gmail', 'v1', credentials=credentials)
+    @staticmethod
+    def _auth_headers(access_token: str) -> Dict[str, str]:
+        """Bearer auth header for Google API calls"""
+        return {"Authorization": f"Bearer {access_token}"}
     
     async def refresh_access_token(self, refresh_token: str) -> str:
         """
-        Refresh expired access token using refresh token
-        Returns: new access token
+        Access token for a stored (encrypted) refresh token
+        
+        Returns: access token (see get_access_token)
+        """
+        return await self.get_access_token(decrypt_token(refresh_token))
+    
+    async def get_access_token(self, decrypted_token: str) -> str:
         """
-        # Decrypt refresh token if needed
-        try:
-            decrypted_token = decrypt_token(refresh_token)
-        except:
-            decrypted_token = refresh_token
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://oauth2.googleapis.com/token",
-                data={
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "refresh_token": decrypted_token,
-                    "grant_type": "refresh_token"
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data["access_token"]
+        Access token for a decrypted refresh token, cached in-process until it expires
+        
+        Fresh tokens are returned straight from the cache. Tokens within
+        TOKEN_REFRESH_MARGIN of expiry are returned while a background refresh
+        runs; only expired or unknown tokens wait for Google's token endpoint.
+        Returns: access token
+        """
+        key = self._token_key(decrypted_token)
+        cached = self._access_tokens.get(key)
+        if cached is not None:
+            access_token, expires_at = cached
+            remaining = expires_at - time.monotonic()
+            if remaining > TOKEN_REFRESH_MARGIN:
+                return access_token
+            if remaining > 0:
+                self._start_token_refresh(key, decrypted_token)
+                return access_token
+        
+        # Shielded so a cancelled caller doesn't cancel a refresh others are waiting on
+        return await asyncio.shield(self._start_token_refresh(key, decrypted_token))
+    
+    def _start_token_refresh(self, key: str, refresh_token: str) -> asyncio.Task:
+        """Single-flight refresh: reuse the task already in flight for this token on this loop"""
+        loop = asyncio.get_running_loop()
+        task = self._token_refreshes.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._fetch_access_token(refresh_token))
+            task.add_done_callback(lambda t: self._token_refresh_done(key, t))
+            self._token_refreshes[key] = task
+        return task
+    
+    def _token_refresh_done(self, key: str, task: asyncio.Task):
+        """Forget a finished refresh and log failures nobody awaited"""
+        if self._token_refreshes.get(key) is task:
+            del self._token_refreshes[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Access token refresh failed: {task.exception()}")
+    
+    async def _fetch_access_token(self, refresh_token: str) -> str:
+        """Exchange a (decrypted) refresh token for a new access token and cache it"""
+        response = await self._send(
+            "POST",
+            GOOGLE_TOKEN_URI,
+            data={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token"
+            }
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        access_token = data["access_token"]
+        
+        key = self._token_key(refresh_token)
+        if key not in self._access_tokens and len(self._access_tokens) >= MAX_CACHED_ACCESS_TOKENS:
+            self._access_tokens.pop(next(iter(self._access_tokens)))
+        self._access_tokens[key] = (access_token, time.monotonic() + data.get("expires_in", 3600))
+        return access_token
     
     async def fetch_emails(
         self,
@@ -207,30 +655,67 @@ class GmailService:
                 "resultSizeEstimate": 1000
             }
         """
-        service = self.get_gmail_service(access_token)
+        query = query or settings.EMAIL_SEARCH_QUERY
+        
+        # List pages are stable for a short window; re-scans can skip the call
+        cache_key = (
+            f"gmail:list:{self._token_key(access_token)}:"
+            f"{max_results}:{page_token or ''}:{query}"
+        )
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        params = {"q": query, "maxResults": max_results, "fields": LIST_FIELDS}
+        if page_token:
+            params["pageToken"] = page_token
+        
+        await self._quota(access_token).acquire(MESSAGES_LIST_COST)
         
         try:
-            result = service.users().messages().list(
-                userId='me',
-                q=query or settings.EMAIL_SEARCH_QUERY,
-                maxResults=max_results,
-                pageToken=page_token
-            ).execute()
-            
-            return result
+            response = await self._send(
+                "GET",
+                f"{GMAIL_API_BASE}/messages",
+                params=params,
+                headers=self._auth_headers(access_token)
+            )
+            response.raise_for_status()
         
-        except HttpError as error:
+        except httpx.HTTPError as error:
             logger.error(f"Gmail API error: {error}")
             raise
+        
+        result = orjson.loads(response.content)
+        await self._cache_set(cache_key, result, settings.GMAIL_LIST_CACHE_TTL)
+        return result
+    
+    def _message_get_params(self, headers_only: bool, raw: bool = False) -> Dict:
+        """Query parameters for messages.get (full, headers only, or raw RFC 822)"""
+        if headers_only:
+            return {
+                "format": "metadata",
+                "metadataHeaders": METADATA_HEADERS,
+                "fields": METADATA_FIELDS
+            }
+        if raw:
+            return {"format": "raw", "fields": RAW_FIELDS}
+        return {"format": "full"}
     
     async def get_email_details(
         self,
         access_token: str,
-        message_id: str
+        message_id: str,
+        headers_only: bool = False,
+        raw: bool = False
     ) -> Dict:
         """
         Fetch full email details including body
         
+        With headers_only=True, only From/To/Subject/Date headers, snippet and
+        labels are returned (no base64 body download). With raw=True, the whole
+        RFC 822 message comes back as one base64url "raw" field instead of the
+        payload tree (note: this includes attachment bytes).
+        
         Returns:
             {
                 "id": "...",
@@ -244,160 +729,298 @@ class GmailService:
                 "internalDate": "..."
             }
         """
-        service = self.get_gmail_service(access_token)
+        await self._quota(access_token).acquire(MESSAGES_GET_COST)
         
         try:
-            message = service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'  # Get full message including body
-            ).execute()
-            
-            return message
+            response = await self._send(
+                "GET",
+                f"{GMAIL_API_BASE}/messages/{message_id}",
+                params=self._message_get_params(headers_only, raw),
+                headers=self._auth_headers(access_token)
+            )
+            response.raise_for_status()
         
-        except HttpError as error:
+        except httpx.HTTPError as error:
             logger.error(f"Error fetching email {message_id}: {error}")
             raise
+        
+        return orjson.loads(response.content)
     
     def extract_email_content(self, message: Dict) -> Dict:
+        """Extract useful content from Gmail message object (see extract_email_content)"""
+        return extract_email_content(message)
+    
+    async def _extract_batch(self, messages: List[Dict], params: Dict) -> List:
         """
-        Extract useful content from Gmail message object
+        Run extract_email_content over a batch of fetched messages
         
-        Returns:
-            {
-                "id": "...",
-                "date": datetime,
-                "from": "sender@example.com",
-                "subject": "...",
-                "snippet": "...",
-                "body_text": "...",
-                "body_html": "..."
-            }
+        format=raw batches (full MIME parsing) go to the shared process pool
+        when one is available; the lazy JSON path is cheap enough to run inline.
         """
-        # Extract headers
-        headers = {
-            header['name']: header['value']
-            for header in message['payload'].get('headers', [])
-        }
+        pool = get_process_pool() if params.get("format") == "raw" else None
+        if pool is None:
+            return _extract_many(messages)
         
-        # Parse date
-        date_str = headers.get('Date', '')
-        try:
-            from email.utils import parsedate_to_datetime
-            date = parsedate_to_datetime(date_str)
-        except:
-            date = None
-        
-        # Extract body
-        body_text = ""
-        body_html = ""
-        
-        def get_body_from_parts(parts):
-            """Recursively extract body from message parts"""
-            text = ""
-            html = ""
-            
-            for part in parts:
-                mime_type = part.get('mimeType', '')
-                
-                if mime_type == 'text/plain':
-                    data = part.get('body', {}).get('data', '')
-                    if data:
-                        text += base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                
-                elif mime_type == 'text/html':
-                    data = part.get('body', {}).get('data', '')
-                    if data:
-                        html += base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                
-                # Handle nested parts
-                if 'parts' in part:
-                    nested_text, nested_html = get_body_from_parts(part['parts'])
-                    text += nested_text
-                    html += nested_html
-            
-            return text, html
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, _extract_many, messages)
+    
+    async def _batch_http_get(
+        self,
+        access_token: str,
+        message_ids: List[str],
+        params: Dict
+    ) -> List:
+        """
+        Fetch up to 100 messages in a single round trip via Gmail's batch endpoint
         
-        # Check if body is directly in payload
-        if 'body' in message['payload'] and message['payload']['body'].get('data'):
-            body_text = base64.urlsafe_b64decode(
-                message['payload']['body']['data']
-            ).decode('utf-8', errors='ignore')
+        The batch call itself is retried on transient failures by _send;
+        an error response that remains is raised as httpx.HTTPStatusError.
         
-        # Or extract from parts
-        elif 'parts' in message['payload']:
-            body_text, body_html = get_body_from_parts(message['payload']['parts'])
+        Returns: Message dicts in the same order as message_ids; failed
+                 sub-requests are returned as GmailBatchItemError instead
+        """
+        boundary = f"batch_{uuid.uuid4().hex}"
+        query = urlencode(params, doseq=True)
+        parts = [
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <item{index}>\r\n\r\n"
+            f"GET /gmail/v1/users/me/messages/{message_id}?{query}\r\n\r\n"
+            for index, message_id in enumerate(message_ids)
+        ]
+        body = "".join(parts) + f"--{boundary}--\r\n"
         
-        return {
-            "id": message['id'],
-            "thread_id": message.get('threadId'),
-            "date": date,
-            "from": headers.get('From', ''),
-            "to": headers.get('To', ''),
-            "subject": headers.get('Subject', ''),
-            "snippet": message.get('snippet', ''),
-            "body_text": body_text,
-            "body_html": body_html,
-            "labels": message.get('labelIds', [])
-        }
+        response = await self._send(
+            "POST",
+            GMAIL_BATCH_URL,
+            content=body.encode(),
+            headers={
+                **self._auth_headers(access_token),
+                "Content-Type": f"multipart/mixed; boundary={boundary}"
+            },
+            timeout=30.0
+        )
+        response.raise_for_status()
+        
+        return self._parse_batch_response(
+            response.headers.get("content-type", ""),
+            response.content,
+            message_ids
+        )
+    
+    def _parse_batch_response(
+        self,
+        content_type: str,
+        content: bytes,
+        message_ids: List[str]
+    ) -> List:
+        """Split a multipart/mixed batch response back into per-message results"""
+        results: List = [
+            GmailBatchItemError(message_id, 0, b"missing from batch response")
+            for message_id in message_ids
+        ]
+        
+        multipart = BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + content
+        )
+        
+        for part in multipart.get_payload():
+            # Response parts echo our Content-ID as "<response-itemN>"
+            content_id = part.get("Content-ID", "").strip("<>")
+            try:
+                index = int(content_id.rsplit("item", 1)[1])
+            except (IndexError, ValueError):
+                logger.warning(f"Unexpected batch part Content-ID: {content_id}")
+                continue
+            
+            http_response = part.get_payload(decode=True) or b""
+            head, _, json_body = http_response.partition(b"\r\n\r\n")
+            status_line = head.split(b"\r\n", 1)[0]
+            
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                status = 0
+            
+            if status != 200:
+                results[index] = GmailBatchItemError(message_ids[index], status, json_body)
+                continue
+            
+            try:
+                results[index] = orjson.loads(json_body)
+            except ValueError as e:
+                results[index] = GmailBatchItemError(message_ids[index], 0, f"invalid JSON: {e}".encode())
+        
+        return results
     
     async def batch_fetch_emails(
         self,
         access_token: str,
         message_ids: List[str],
-        batch_size: int = 100
+        batch_size: int = GMAIL_BATCH_LIMIT,
+        headers_only: bool = False,
+        raw: bool = False
     ) -> AsyncGenerator[Dict, None]:
         """
         Fetch multiple emails in batches for efficiency
         
+        Each batch is sent as one multipart request to Gmail's batch endpoint
+        (max 100 sub-requests per call). Calls are paced by a per-user token
+        bucket on quota units, and rate-limited or 5xx items are retried with
+        backoff; a batch that still fails raises. Pass headers_only=True when the caller needs only
+        sender/subject/date, or raw=True to fetch RFC 822 source and parse
+        it with the stdlib email parser.
+        
+        Fetching runs in a background producer that feeds a bounded queue,
+        so the next batch is already in flight while the caller processes
+        the current one.
+        
         Yields: Extracted email content dicts
         """
-        for i in range(0, len(message_ids), batch_size):
-            batch = message_ids[i:i + batch_size]
-            
-            # Fetch emails in parallel
-            tasks = [
-                self.get_email_details(access_token, msg_id)
-                for msg_id in batch
-            ]
+        batch_size = min(batch_size, GMAIL_BATCH_LIMIT)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * batch_size)
+        params = self._message_get_params(headers_only, raw)
+        producer = asyncio.create_task(
+            self._produce_emails(access_token, message_ids, batch_size, params, queue)
+        )
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not producer.done():
+                producer.cancel()
+    
+    async def _produce_emails(
+        self,
+        access_token: str,
+        message_ids: List[str],
+        batch_size: int,
+        params: Dict,
+        queue: asyncio.Queue
+    ):
+        """
+        Producer for batch_fetch_emails: fetch batches and queue extracted emails
+        
+        Up to GMAIL_BATCH_CONCURRENCY batch calls run at once, so one batch's
+        round trip overlaps the next one's quota wait. Puts None when done,
+        or the exception if fetching fails unexpectedly.
+        """
+        quota = self._quota(access_token)
+        limit = asyncio.Semaphore(settings.GMAIL_BATCH_CONCURRENCY)
+        
+        async def fetch(batch_ids: List[str]):
+            async with limit:
+                await self._fetch_batch(access_token, batch_ids, params, quota, queue)
+        
+        # Tasks queue on the semaphore in order, so batches start in list order
+        tasks = [
+            asyncio.create_task(fetch(message_ids[i:i + batch_size]))
+            for i in range(0, len(message_ids), batch_size)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(None)
+        finally:
+            for fetch_task in tasks:
+                fetch_task.cancel()
+    
+    async def _fetch_batch(
+        self,
+        access_token: str,
+        message_ids: List[str],
+        params: Dict,
+        quota: TokenBucket,
+        queue: asyncio.Queue
+    ):
+        """
+        Fetch one batch and queue the extracted emails
+        
+        Rate-limited and 5xx items are retried with backoff; messages deleted
+        since listing (404) are skipped. Any other failure, or items still
+        failing after GMAIL_MAX_RETRIES, raises so the scan fails instead of
+        silently coming up short.
+        """
+        pending = message_ids
+        attempt = 0
+        
+        while pending:
+            # Each sub-request is billed as a separate messages.get
+            await quota.acquire(MESSAGES_GET_COST * len(pending))
             
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            results = await self._batch_http_get(access_token, pending, params)
             
+            failed: List[GmailBatchItemError] = []
+            messages = []
             for result in results:
-                if isinstance(result, Exception):
-                    logger.error(f"Error in batch fetch: {result}")
+                if not isinstance(result, GmailBatchItemError):
+                    messages.append(result)
+                elif result.retryable:
+                    failed.append(result)
+                elif result.status == 404:
+                    logger.warning(f"Email {result.message_id} no longer exists, skipping")
+                else:
+                    raise result
+            
+            for extracted in await self._extract_batch(messages, params):
+                if isinstance(extracted, Exception):
+                    logger.error(f"Error extracting email content: {extracted}")
                     continue
                 
-                try:
-                    extracted = self.extract_email_content(result)
-                    yield extracted
-                except Exception as e:
-                    logger.error(f"Error extracting email content: {e}")
-                    continue
+                await queue.put(extracted)
+            
+            if not failed:
+                return
             
-            # Rate limiting: sleep between batches
-            await asyncio.sleep(0.5)
+            if any(error.rate_limited for error in failed):
+                # Gmail is limiting us below the configured quota; pace later batches slower too
+                quota.slow_down()
+            
+            if attempt >= settings.GMAIL_MAX_RETRIES:
+                raise RuntimeError(
+                    f"Giving up on {len(failed)} emails after {attempt} retries: {failed[0]}"
+                )
+            
+            delay = backoff_delay(attempt)
+            logger.warning(
+                f"Gmail batch fetch failed for {len(failed)} emails, retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            pending = [error.message_id for error in failed]
+            attempt += 1
     
     async def search_emails_by_sender(
         self,
         access_token: str,
         sender_domain: str,
         after_date: datetime = None,
-        max_results: int = 10
-    ) -> List[Dict]:
+        max_results: int = 10,
+        headers_only: bool = True
+    ) -> AsyncGenerator[Dict, None]:
         """
         Search for emails from a specific sender (for confirmation emails)
         
+        Defaults to header-only fetches: subject and snippet are enough to
+        spot a confirmation, so message bodies are not downloaded. Emails are
+        yielded as they arrive; closing the generator early (aclose) stops
+        the remaining fetches.
+        
         Args:
             sender_domain: e.g., "netflix.com"
             after_date: Only emails after this date
             max_results: Max emails to return
+            headers_only: Skip body download (sender/subject/date/snippet only);
+                          pass False when body_text is needed
         """
-        query = f"from:@{sender_domain}"
-        
-        if after_date:
-            date_str = after_date.strftime('%Y/%m/%d')
-            query += f" after:{date_str}"
+        query = _sender_query(sender_domain, after_date.toordinal() if after_date else None)
         
         result = await self.fetch_emails(
             access_token=access_token,
@@ -407,13 +1030,18 @@ class GmailService:
         
         message_ids = [msg['id'] for msg in result.get('messages', [])]
         
-        emails = []
-        async for email in self.batch_fetch_emails(access_token, message_ids):
-            emails.append(email)
-        
-        return emails
+        emails = self.batch_fetch_emails(access_token, message_ids, headers_only=headers_only)
+        try:
+            async for email in emails:
+                yield email
+        finally:
+            await emails.aclose()
 
 
-# Global instance
-gmail_service = GmailService()
+def get_gmail_service(request: Request) -> GmailService:
+    """Dependency: the GmailService created in the app lifespan"""
+    return request.app.state.gmail_service
+
 
+# Global instance for code running outside the API (Celery tasks, services)
+gmail_service = GmailService()
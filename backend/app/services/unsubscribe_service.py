@@ -5,25 +5,146 @@ Handles automated cancellation attempts and confirmation monitoring
 import asyncio
 from typing import Dict, Optional
 from datetime import datetime, timedelta
+from functools import lru_cache
 import logging
+import re
 from urllib.parse import urlparse
 
 import httpx
-from playwright.async_api import async_playwright
 
 from app.config import settings
+from app.services.browser_pool import BrowserPool
 from app.services.gmail_service import gmail_service
-from app.utils.patterns import CANCELLATION_CONFIRMATION_PATTERNS
+from app.utils.patterns import CANCELLATION_CONFIRMATION_RE
+from app.utils.email_content import body_prefix
+from app.utils.rate_limit import TokenBucket, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+# Phrases on an unsubscribe landing page that confirm it worked
+UNSUBSCRIBE_SUCCESS_KEYWORDS = (
+    'successfully unsubscribed',
+    'unsubscribe successful',
+    'you have been unsubscribed',
+    'subscription cancelled',
+    'cancellation confirmed'
+)
+_LONGEST_SUCCESS_KEYWORD = max(map(len, UNSUBSCRIBE_SUCCESS_KEYWORDS))
+_SUCCESS_RE = re.compile('|'.join(map(re.escape, UNSUBSCRIBE_SUCCESS_KEYWORDS)), re.IGNORECASE)
+
+# Unsubscribe link classification (see _analyze_unsubscribe_link)
+_DIRECT_QUERY_RE = re.compile(r'token=|id=|email=|unsubscribe=', re.IGNORECASE)
+_LINK_PATH_RE = re.compile(
+    r'(?P<login_required>login|signin|account)|(?P<form>cancel|manage|settings)',
+    re.IGNORECASE
+)
+
+# Throttling responses from unsubscribe endpoints worth retrying after a backoff
+RETRYABLE_STATUS_CODES = frozenset({429, 503})
+
+# Stop scanning a landing page for success keywords after this many characters
+MAX_SUCCESS_SCAN_CHARS = 32 * 1024
+
+# Shown when a cancellation needs the user (see get_manual_instructions)
+MANUAL_INSTRUCTIONS_TEMPLATE = """
+To cancel your {service_name} subscription:
+
+1. Visit: {unsubscribe_url}
+2. Log in to your account if required
+3. Look for "Cancel Subscription" or "Manage Subscription" options
+4. Follow the on-screen instructions to complete cancellation
+
+If you need help, you can:
+- Contact {service_name} customer support
+- Check their help center for cancellation guides
+- Look for a "Contact Us" or "Support" link on their website
+
+We'll continue monitoring your inbox for a confirmation email.
+""".strip()
+
+
+@lru_cache(maxsize=4096)
+def _classify_unsubscribe_link(url: str) -> str:
+    """
+    Cancellation type for an unsubscribe URL (see _analyze_unsubscribe_link)
+    
+    Cached: services send the same link across many emails and users.
+    """
+    parsed = urlparse(url)
+    
+    # Direct cancellation indicators (usually token-based)
+    if _DIRECT_QUERY_RE.search(parsed.query):
+        return "direct"
+    
+    # One pass over the path: login indicators win over form indicators
+    link_type = "unknown"
+    for match in _LINK_PATH_RE.finditer(parsed.path):
+        if match.lastgroup == "login_required":
+            return "login_required"
+        link_type = "form"
+    
+    return link_type
+
+
+def create_http_client(timeout: float) -> httpx.AsyncClient:
+    """Pooled keep-alive client for visiting unsubscribe links"""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+    )
+
 
 class UnsubscribeService:
     """Service for managing subscription cancellations"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        browser_pool: Optional[BrowserPool] = None
+    ):
         self.timeout = settings.UNSUBSCRIBE_TIMEOUT_SECONDS
         self.max_retries = settings.UNSUBSCRIBE_MAX_RETRIES
+        # Injected by the caller; otherwise created lazily per event loop
+        self._client = http_client
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Bound outbound unsubscribe requests (in flight and per second)
+        self._concurrency = asyncio.Semaphore(settings.HTTP_MAX_CONCURRENCY)
+        self._rate = TokenBucket(settings.UNSUBSCRIBE_REQUESTS_PER_SECOND)
+        # Injected by the caller; otherwise browsers launch on first use
+        self._owns_browser_pool = browser_pool is None
+        self.browser_pool = browser_pool or BrowserPool()
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        Shared keep-alive client for unsubscribe links
+        
+        Repeat cancellations against the same vendor reuse pooled connections
+        instead of a fresh TCP/TLS handshake per attempt. Without an injected
+        client, one is created per event loop (each Celery worker thread keeps
+        its own, see worker.tasks.run_async).
+        """
+        if self._client is not None and self._client_loop is None:
+            return self._client
+        
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = create_http_client(self.timeout)
+            self._client_loop = loop
+            self._concurrency = asyncio.Semaphore(settings.HTTP_MAX_CONCURRENCY)
+        return self._client
+    
+    async def aclose(self):
+        """Close a lazily created client and browser pool (injected ones are closed by their owner)"""
+        if self._client is not None and self._client_loop is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+        
+        if self._owns_browser_pool:
+            await self.browser_pool.shutdown()
     
     async def initiate_cancellation(
         self,
@@ -83,60 +204,51 @@ class UnsubscribeService:
         Analyze unsubscribe link to determine cancellation type
         Returns: "direct", "form", "login_required", "unknown"
         """
-        parsed = urlparse(url)
-        path = parsed.path.lower()
-        query = parsed.query.lower()
-        
-        # Direct cancellation indicators (usually token-based)
-        if any(param in query for param in ['token=', 'id=', 'email=', 'unsubscribe=']):
-            return "direct"
-        
-        # Login required indicators
-        if any(keyword in path for keyword in ['login', 'signin', 'account']):
-            return "login_required"
-        
-        # Form-based indicators
-        if any(keyword in path for keyword in ['cancel', 'manage', 'settings']):
-            return "form"
-        
-        return "unknown"
+        return _classify_unsubscribe_link(url)
     
     async def _direct_cancellation(self, url: str) -> Dict:
         """
         Attempt direct cancellation via HTTP GET
+        
+        Requests are bounded by HTTP_MAX_CONCURRENCY and
+        UNSUBSCRIBE_REQUESTS_PER_SECOND; 429/503 responses are retried with
+        backoff up to max_retries times.
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
-                response = await client.get(url)
-                
-                # Check response for success indicators
-                success_keywords = [
-                    'successfully unsubscribed',
-                    'unsubscribe successful',
-                    'you have been unsubscribed',
-                    'subscription cancelled',
-                    'cancellation confirmed'
-                ]
+            client = self.http
+            for attempt in range(self.max_retries + 1):
+                async with self._concurrency:
+                    await self._rate.acquire()
+                    async with client.stream("GET", url) as response:
+                        retry = response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries
+                        if not retry:
+                            # A 200 counts as success on its own; only other statuses
+                            # need the page checked for success indicators
+                            is_success = response.status_code == 200 or await self._page_confirms_unsubscribe(response)
                 
-                response_text = response.text.lower()
-                is_success = any(kw in response_text for kw in success_keywords)
+                if not retry:
+                    break
                 
-                if is_success or response.status_code == 200:
-                    return {
-                        "status": "success",
-                        "action_type": "automated",
-                        "message": "Cancellation link visited successfully",
-                        "requires_user_action": False,
-                        "http_status": response.status_code
-                    }
-                else:
-                    return {
-                        "status": "failed",
-                        "action_type": "automated",
-                        "message": f"Unexpected response from cancellation link (HTTP {response.status_code})",
-                        "requires_user_action": True,
-                        "http_status": response.status_code
-                    }
+                delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+                logger.warning(f"Unsubscribe link throttled (HTTP {response.status_code}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            
+            if is_success:
+                return {
+                    "status": "success",
+                    "action_type": "automated",
+                    "message": "Cancellation link visited successfully",
+                    "requires_user_action": False,
+                    "http_status": response.status_code
+                }
+            else:
+                return {
+                    "status": "failed",
+                    "action_type": "automated",
+                    "message": f"Unexpected response from cancellation link (HTTP {response.status_code})",
+                    "requires_user_action": True,
+                    "http_status": response.status_code
+                }
         
         except Exception as e:
             logger.error(f"Direct cancellation failed: {e}")
@@ -147,15 +259,38 @@ class UnsubscribeService:
                 "requires_user_action": True
             }
     
+    @staticmethod
+    async def _page_confirms_unsubscribe(response: httpx.Response) -> bool:
+        """
+        Scan a streamed response for success keywords
+        
+        Reads chunk by chunk and stops at the first match (or after
+        MAX_SUCCESS_SCAN_CHARS) instead of buffering and lowercasing the whole
+        page; confirmation text sits near the top of these pages.
+        """
+        tail = ''
+        scanned = 0
+        async for chunk in response.aiter_text():
+            # Keep the end of the previous chunk so keywords split across chunks match
+            window = tail + chunk
+            if _SUCCESS_RE.search(window):
+                return True
+            
+            tail = window[-_LONGEST_SUCCESS_KEYWORD:]
+            scanned += len(chunk)
+            if scanned >= MAX_SUCCESS_SCAN_CHARS:
+                break
+        
+        return False
+    
     async def _form_cancellation(self, url: str) -> Dict:
         """
         Attempt form-based cancellation using headless browser
         WARNING: This is complex and may not work for all sites
         """
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
+            async with self.browser_pool.acquire() as context:
+                page = await context.new_page()
                 
                 # Navigate to cancellation page
                 await page.goto(url, timeout=self.timeout * 1000)
@@ -183,18 +318,17 @@ class UnsubscribeService:
                                 'unsubscribed',
                                 'cancellation confirmed'
                             ]):
-                                await browser.close()
                                 return {
                                     "status": "success",
                                     "action_type": "automated",
                                     "message": "Form-based cancellation completed",
                                     "requires_user_action": False
                                 }
-                    except:
+                    except Exception:
+                        # Not asyncio.CancelledError: a cancelled task must unwind so the
+                        # pooled browser context is closed
                         continue
                 
-                await browser.close()
-                
                 # If we got here, couldn't find/click cancel button
                 return {
                     "status": "manual_required",
@@ -228,44 +362,46 @@ class UnsubscribeService:
         """
         logger.info(f"Monitoring for confirmation from {service_domain}")
         
-        # Search for emails from service
-        emails = await gmail_service.search_emails_by_sender(
+        # Search for emails from service, stopping at the first confirmation
+        emails = gmail_service.search_emails_by_sender(
             access_token=user_access_token,
             sender_domain=service_domain,
             after_date=start_date,
             max_results=20
         )
-        
-        # Check each email for confirmation language
-        for email in emails:
-            if self._is_cancellation_confirmation(email):
-                return {
-                    "confirmed": True,
-                    "confirmation_email_id": email['id'],
-                    "confirmation_date": email['date'],
-                    "confirmation_subject": email['subject']
-                }
+        try:
+            async for email in emails:
+                if self._is_cancellation_confirmation(email):
+                    return self._confirmation_details(email)
+        finally:
+            await emails.aclose()
         
         return None
     
+    @staticmethod
+    def _confirmation_details(email: Dict) -> Dict:
+        """Confirmation result for a matching email"""
+        return {
+            "confirmed": True,
+            "confirmation_email_id": email['id'],
+            "confirmation_date": email['date'],
+            "confirmation_subject": email['subject']
+        }
+    
     def _is_cancellation_confirmation(self, email: Dict) -> bool:
         """
         Check if email contains cancellation confirmation language
         """
-        text = (
-            email.get('subject', '') + ' ' +
-            email.get('snippet', '') + ' ' +
-            email.get('body_text', '')[:500]
-        ).lower()
-        
-        import re
-        for pattern in CANCELLATION_CONFIRMATION_PATTERNS:
-            if re.search(pattern, text):
-                return True
+        # One join, no lowercased copy: the pattern is case-insensitive
+        text = ' '.join((
+            email.get('subject', ''),
+            email.get('snippet', ''),
+            body_prefix(email, 'body_text', 500)
+        ))
         
-        return False
+        return CANCELLATION_CONFIRMATION_RE.search(text) is not None
     
-    async def get_manual_instructions(
+    def get_manual_instructions(
         self,
         service_name: str,
         unsubscribe_url: str
@@ -273,22 +409,9 @@ class UnsubscribeService:
         """
         Generate user-friendly manual cancellation instructions
         """
-        instructions = f"""
-To cancel your {service_name} subscription:
-
-1. Visit: {unsubscribe_url}
-2. Log in to your account if required
-3. Look for "Cancel Subscription" or "Manage Subscription" options
-4. Follow the on-screen instructions to complete cancellation
-
-If you need help, you can:
-- Contact {service_name} customer support
-- Check their help center for cancellation guides
-- Look for a "Contact Us" or "Support" link on their website
-
-We'll continue monitoring your inbox for a confirmation email.
-"""
-        return instructions.strip()
+        return MANUAL_INSTRUCTIONS_TEMPLATE.format_map(
+            {"service_name": service_name, "unsubscribe_url": unsubscribe_url}
+        )
 
 
 # Global instance
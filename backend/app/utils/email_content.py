@@ -0,0 +1,119 @@
+"""
+Lazily decoded email bodies for extracted Gmail messages
+"""
+import binascii
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional
+
+# base64url -> standard alphabet, for binascii
+_B64URL_TRANS = bytes.maketrans(b'-_', b'+/')
+
+
+def b64url_decode(data: str) -> bytes:
+    """
+    Decode base64url data (padded or not) straight through binascii
+    
+    Skips base64.urlsafe_b64decode's wrapper; the extra '==' completes any
+    missing padding and is ignored when the input is already padded.
+    """
+    return binascii.a2b_base64(data.encode('ascii').translate(_B64URL_TRANS) + b'==')
+
+
+class LazyBody:
+    """base64url MIME part data that is only decoded when (and as far as) needed"""
+    
+    __slots__ = ('_chunks', '_decoded')
+    
+    def __init__(self, chunks: List[str]):
+        self._chunks = chunks
+        self._decoded: Optional[str] = None
+    
+    def get(self, limit: Optional[int] = None) -> str:
+        """Decoded text, or just its first `limit` characters"""
+        if self._decoded is not None:
+            return self._decoded if limit is None else self._decoded[:limit]
+        
+        if limit is None:
+            self._decoded = b"".join(b64url_decode(chunk) for chunk in self._chunks).decode(
+                'utf-8', errors='ignore'
+            )
+            self._chunks = []
+            return self._decoded
+        
+        # A UTF-8 character is at most 4 bytes; every 4 base64 chars hold 3 bytes
+        remaining = limit * 4
+        pieces = []
+        for chunk in self._chunks:
+            piece = b64url_decode(chunk[:(remaining + 2) // 3 * 4])
+            pieces.append(piece)
+            remaining -= len(piece)
+            if remaining <= 0:
+                break
+        
+        return b"".join(pieces).decode('utf-8', errors='ignore')[:limit]
+
+
+class EmailContent(MutableMapping):
+    """
+    Extracted email mapping whose body_text/body_html are decoded on first access
+    
+    Behaves like the plain dict extract_email_content used to return: item
+    access, get()/in, assignment, len(), iteration, items(), dict(e), {**e},
+    == and pickling all see the bodies (reading their values decodes them;
+    pickling keeps them encoded). It is not a dict subclass, so dict-only
+    consumers such as orjson.dumps need dict(e). Most scanned emails are
+    rejected after looking at only the start of the body, so body_prefix()
+    reads that without decoding the whole part.
+    """
+    
+    __slots__ = ('_fields', '_bodies')
+    
+    def __init__(self, fields: Dict, bodies: Dict[str, LazyBody]):
+        self._fields = fields
+        self._bodies = bodies
+    
+    def __getitem__(self, key):
+        fields = self._fields
+        if key not in fields:
+            fields[key] = self._bodies.pop(key).get()
+        return fields[key]
+    
+    def __setitem__(self, key, value):
+        self._bodies.pop(key, None)
+        self._fields[key] = value
+    
+    def __delitem__(self, key):
+        if key in self._bodies:
+            del self._bodies[key]
+        else:
+            del self._fields[key]
+    
+    def __iter__(self) -> Iterator:
+        # Snapshot: reading a body while iterating moves it into _fields
+        return iter([*self._fields, *self._bodies])
+    
+    def __len__(self) -> int:
+        return len(self._fields) + len(self._bodies)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._fields or key in self._bodies
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def copy(self) -> Dict:
+        """Plain dict with the bodies decoded"""
+        return dict(self)
+    
+    def __repr__(self) -> str:
+        return f"EmailContent({self.copy()!r})"
+
+
+def body_prefix(email_data: Dict, key: str, limit: int) -> str:
+    """First `limit` characters of a body field, decoding no more than needed"""
+    if isinstance(email_data, EmailContent) and key in email_data._bodies:
+        return email_data._bodies[key].get(limit)
+    return email_data.get(key, '')[:limit]
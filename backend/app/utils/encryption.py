@@ -1,6 +1,7 @@
 """
 Token encryption utilities using Fernet (symmetric encryption)
 """
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from app.config import settings
 import logging
@@ -9,22 +10,41 @@ logger = logging.getLogger(__name__)
 
 
 def get_encryption_key() -> bytes:
-    """Get encryption key from settings or generate a new one"""
+    """
+    Get encryption key from settings, or generate a temporary one when unset
+    
+    A configured key that is not a valid Fernet key raises ValueError rather
+    than being replaced by a random one, which would make every stored token
+    undecryptable.
+    """
     key = settings.ENCRYPTION_KEY
     
     if not key:
         logger.warning("ENCRYPTION_KEY not set, generating new key (tokens will not persist across restarts)")
-        key = Fernet.generate_key().decode()
+        return Fernet.generate_key()
     
-    # If key is a string, encode it
-    if isinstance(key, str):
-        # If it's already a valid Fernet key, use it directly
-        try:
-            return key.encode() if len(key) == 44 else Fernet.generate_key()
-        except:
-            return Fernet.generate_key()
+    key_bytes = key.encode() if isinstance(key, str) else key
+    try:
+        Fernet(key_bytes)
+    except (ValueError, TypeError) as e:
+        raise ValueError(
+            "ENCRYPTION_KEY must be a 44-character url-safe base64 Fernet key "
+            "(generate one with Fernet.generate_key())"
+        ) from e
     
-    return key
+    return key_bytes
+
+
+@lru_cache(maxsize=1)
+def get_fernet() -> Fernet:
+    """
+    Process-wide Fernet instance
+    
+    Built once instead of per call (key decoding and validation), which also
+    keeps a generated fallback key stable for the life of the process.
+    GmailService.startup() calls this, so a misconfigured key fails at boot.
+    """
+    return Fernet(get_encryption_key())
 
 
 def encrypt_token(token: str) -> str:
@@ -32,9 +52,7 @@ def encrypt_token(token: str) -> str:
     Encrypt a token (e.g., Gmail refresh token) for storage
     """
     try:
-        key = get_encryption_key()
-        f = Fernet(key)
-        encrypted = f.encrypt(token.encode())
+        encrypted = get_fernet().encrypt(token.encode())
         return encrypted.decode()
     except Exception as e:
         logger.error(f"Token encryption failed: {e}")
@@ -46,9 +64,7 @@ def decrypt_token(encrypted_token: str) -> str:
     Decrypt a stored token
     """
     try:
-        key = get_encryption_key()
-        f = Fernet(key)
-        decrypted = f.decrypt(encrypted_token.encode())
+        decrypted = get_fernet().decrypt(encrypted_token.encode())
         return decrypted.decode()
     except Exception as e:
         logger.error(f"Token decryption failed: {e}")
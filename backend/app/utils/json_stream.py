@@ -0,0 +1,58 @@
+"""
+Incremental detection of a JSON object in streamed LLM output
+"""
+from typing import List, Optional
+
+
+class JsonObjectReader:
+    """
+    Accumulates streamed text and reports when the first top-level JSON
+    object in it is complete
+    
+    Lets a caller stop reading an LLM stream as soon as the extraction JSON
+    has arrived, instead of waiting for a closing code fence or commentary.
+    Braces inside JSON strings are ignored.
+    """
+    
+    __slots__ = ('_parts', '_length', '_start', '_depth', '_in_string', '_escaped')
+    
+    def __init__(self):
+        self._parts: List[str] = []
+        self._length = 0
+        self._start: Optional[int] = None  # Offset of the opening brace
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, chunk: str) -> Optional[str]:
+        """Add a chunk; returns the object's text once its closing brace arrives"""
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '{':
+                if self._start is None:
+                    self._start = offset + i
+                self._depth += 1
+            elif self._start is None:
+                continue
+            elif char == '"':
+                self._in_string = True
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    return self.text()[self._start:offset + i + 1]
+        
+        return None
+    
+    def text(self) -> str:
+        """Everything received so far"""
+        return ''.join(self._parts)
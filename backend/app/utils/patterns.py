@@ -2,9 +2,12 @@
 Regex patterns for rule-based subscription detection
 """
 import re
+from functools import lru_cache
+
+# Patterns are compiled once at import; detection runs them against every scanned email
 
 # Price patterns (various formats)
-PRICE_PATTERNS = [
+PRICE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
     r'\$(\d+\.\d{2})',  # $19.99
     r'\$(\d+)',  # $20
     r'USD\s*(\d+\.\d{2})',  # USD 19.99
@@ -15,7 +18,7 @@ PRICE_PATTERNS = [
     r'amount:?\s*\$?(\d+\.\d{2})',  # Amount: $19.99
     r'total:?\s*\$?(\d+\.\d{2})',  # Total: $19.99
     r'(\d+,\d{3}\.\d{2})',  # 1,299.99
-]
+]]
 
 # Billing period patterns
 BILLING_PERIOD_PATTERNS = {
@@ -50,22 +53,29 @@ BILLING_PERIOD_PATTERNS = {
     ]
 }
 
+# Flattened (period, pattern) pairs in priority order, for a single scan
+BILLING_PERIOD_REGEXES = [
+    (period, re.compile(pattern, re.IGNORECASE))
+    for period, patterns in BILLING_PERIOD_PATTERNS.items()
+    for pattern in patterns
+]
+
 # Date patterns (various formats)
-DATE_PATTERNS = [
+DATE_PATTERNS = [re.compile(pattern) for pattern in [
     r'\d{4}-\d{2}-\d{2}',  # 2025-12-15
     r'\d{2}/\d{2}/\d{4}',  # 12/15/2025
     r'\d{2}-\d{2}-\d{4}',  # 12-15-2025
     r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{4}',  # January 15, 2025
     r'\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{4}',  # 15 January 2025
-]
+]]
 
 # Unsubscribe link patterns
-UNSUBSCRIBE_LINK_PATTERNS = [
+UNSUBSCRIBE_LINK_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
     r'https?://[^\s<>"]+/(?:unsubscribe|cancel|opt-out|manage|unsub|stop)[^\s<>"]*',
     r'https?://[^\s<>"]+\?.*(?:unsubscribe|cancel|unsub)[^\s<>"]*',
     r'https?://[^\s<>"]+/account/(?:cancel|manage|settings)[^\s<>"]*',
     r'https?://[^\s<>"]+/subscription/(?:cancel|manage)[^\s<>"]*',
-]
+]]
 
 # Subscription-related keywords (for initial filtering)
 SUBSCRIPTION_KEYWORDS = [
@@ -94,6 +104,18 @@ SUBSCRIPTION_KEYWORDS = [
     'unsubscribe',
 ]
 
+# Keywords most often present in inbox mail; checked first so the keyword
+# prefilter's early exit (2 hits) usually comes after a few substring tests
+FREQUENT_SUBSCRIPTION_KEYWORDS = [
+    'unsubscribe', 'subscribe', 'plan', 'payment', 'receipt', 'subscription',
+    'member', 'cancel', 'renew', 'billing', 'premium', 'upgrade', 'paid',
+]
+
+# SUBSCRIPTION_KEYWORDS, most frequent first
+SUBSCRIPTION_KEYWORDS_ORDERED = FREQUENT_SUBSCRIPTION_KEYWORDS + [
+    kw for kw in SUBSCRIPTION_KEYWORDS if kw not in FREQUENT_SUBSCRIPTION_KEYWORDS
+]
+
 # Common service name patterns
 SERVICE_NAME_PATTERNS = {
     'streaming': [
@@ -133,15 +155,41 @@ SERVICE_NAME_PATTERNS = {
     ],
 }
 
+# Exact service name -> category, for names that need no substring scan
+SERVICE_CATEGORIES = {
+    service: category.title()
+    for category, services in SERVICE_NAME_PATTERNS.items()
+    for service in services
+}
+
+# One alternation of service names per category, in priority order (names are matched lowercased)
+SERVICE_CATEGORY_REGEXES = [
+    (category.title(), re.compile('|'.join(re.escape(service) for service in services)))
+    for category, services in SERVICE_NAME_PATTERNS.items()
+]
+
+# Well-known services recognized directly from an email subject
+COMMON_SERVICES = [
+    'netflix', 'spotify', 'hulu', 'disney', 'amazon prime',
+    'dropbox', 'google', 'microsoft', 'adobe', 'apple',
+    'youtube', 'linkedin', 'github', 'slack', 'zoom',
+]
+
+# One scan for any of them (longest names first, so 'amazon prime' beats a shorter overlap)
+COMMON_SERVICE_RE = re.compile(
+    '|'.join(re.escape(service) for service in sorted(COMMON_SERVICES, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
 # Email subject patterns that indicate subscriptions
-SUBSCRIPTION_SUBJECT_PATTERNS = [
+SUBSCRIPTION_SUBJECT_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
     r'subscription\s+(?:confirmation|renewed|active)',
     r'welcome\s+to\s+(?:your|our)\s+(?:premium|plus|pro)',
     r'(?:monthly|annual)\s+(?:payment|invoice|receipt)',
     r'your\s+(?:trial|subscription)\s+(?:has\s+)?(?:ended|expired|renewed)',
     r'(?:billing|payment)\s+(?:confirmation|successful|receipt)',
     r'membership\s+(?:activated|renewed|confirmed)',
-]
+]]
 
 # Confirmation email patterns (for unsubscribe monitoring)
 CANCELLATION_CONFIRMATION_PATTERNS = [
@@ -155,15 +203,22 @@ CANCELLATION_CONFIRMATION_PATTERNS = [
     r'auto[- ]renew(?:al)?\s+(?:disabled|turned\s+off|cancelled)',
 ]
 
+# All confirmation patterns as one alternation: a single scan instead of one per pattern
+CANCELLATION_CONFIRMATION_RE = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in CANCELLATION_CONFIRMATION_PATTERNS),
+    re.IGNORECASE
+)
+
 # Price change patterns
-PRICE_CHANGE_PATTERNS = [
+PRICE_CHANGE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
     r'price\s+(?:change|increase|update)',
     r'new\s+(?:price|rate)',
     r'subscription\s+(?:price\s+)?(?:increase|going\s+up)',
     r'rate\s+adjustment',
-]
+]]
 
 
+@lru_cache(maxsize=1024)
 def get_service_category(service_name: str) -> str:
     """
     Determine service category from service name
@@ -171,13 +226,25 @@ def get_service_category(service_name: str) -> str:
     """
     service_lower = service_name.lower()
     
-    for category, services in SERVICE_NAME_PATTERNS.items():
-        if any(svc in service_lower for svc in services):
-            return category.title()
+    category = SERVICE_CATEGORIES.get(service_lower)
+    if category is not None:
+        return category
+    
+    for category, pattern in SERVICE_CATEGORY_REGEXES:
+        if pattern.search(service_lower):
+            return category
     
     return 'Other'
 
 
+# Plan/tier words trailing a service name (any number of them, as whole words)
+SERVICE_NAME_SUFFIX_RE = re.compile(
+    r'(?:\s+(?:premium|plus|pro|basic|free|trial|individual|family))+$',
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=1024)
 def normalize_service_name(raw_name: str) -> str:
     """
     Normalize service name for consistency
@@ -187,16 +254,16 @@ def normalize_service_name(raw_name: str) -> str:
         "Adobe Creative Cloud" → "Adobe Creative Cloud"
     """
     # Remove common suffixes
-    suffixes = ['premium', 'plus', 'pro', 'basic', 'free', 'trial', 'individual', 'family']
-    
-    name = raw_name.strip()
-    name_lower = name.lower()
-    
-    for suffix in suffixes:
-        if name_lower.endswith(suffix):
-            name = name[:len(name)-len(suffix)].strip()
-    
-    return name.title()
+    return SERVICE_NAME_SUFFIX_RE.sub('', raw_name.strip()).title()
+
+
+# Payment method patterns (last 4 digits)
+PAYMENT_METHOD_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'(?:card|visa|mastercard|amex|discover)\s+ending\s+in\s+(\d{4})',
+    r'\*{4}\s*(\d{4})',
+    r'xxxx\s*(\d{4})',
+    r'•{4}\s*(\d{4})',
+]]
 
 
 def extract_payment_method(text: str) -> str:
@@ -204,15 +271,8 @@ def extract_payment_method(text: str) -> str:
     Extract payment method info (last 4 digits)
     Returns: Last 4 digits or empty string
     """
-    patterns = [
-        r'(?:card|visa|mastercard|amex|discover)\s+ending\s+in\s+(\d{4})',
-        r'\*{4}\s*(\d{4})',
-        r'xxxx\s*(\d{4})',
-        r'•{4}\s*(\d{4})',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in PAYMENT_METHOD_PATTERNS:
+        match = pattern.search(text)
         if match:
             return match.group(1)
     
@@ -232,10 +292,15 @@ SERVICE_LOGOS = {
 }
 
 
+@lru_cache(maxsize=1024)
 def get_service_logo(service_name: str) -> str:
     """Get logo URL for service"""
     service_lower = service_name.lower()
     
+    url = SERVICE_LOGOS.get(service_lower)
+    if url is not None:
+        return url
+    
     for key, url in SERVICE_LOGOS.items():
         if key in service_lower:
             return url
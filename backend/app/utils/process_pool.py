@@ -0,0 +1,37 @@
+"""
+Shared process pool for CPU-bound work (MIME parsing, regex extraction)
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.config import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Lazily created process pool, or None when one can't or shouldn't be used
+    
+    Celery prefork workers are daemonic processes, which may not start child
+    processes, so callers must be ready to run the work inline.
+    """
+    global _pool
+    
+    if not settings.PROCESS_POOL_ENABLED or multiprocessing.current_process().daemon:
+        return None
+    
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.PROCESS_POOL_WORKERS or os.cpu_count())
+    return _pool
+
+
+def shutdown_process_pool():
+    """Stop the pool's worker processes (call on application shutdown)"""
+    global _pool
+    
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
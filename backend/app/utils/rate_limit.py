@@ -0,0 +1,68 @@
+"""
+Async rate limiting and retry backoff helpers
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for asyncio code
+    
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    acquire() reserves its tokens immediately and sleeps off any deficit, so
+    concurrent callers are served in arrival order without needing a lock
+    (which also keeps the bucket usable across event loops).
+    
+    slow_down() lowers the rate for a while when the server rate-limits
+    anyway (e.g. other clients share the quota); it recovers on its own.
+    """
+    
+    # Lowest rate slow_down() can reach, as a fraction of the configured rate
+    MIN_RATE_FACTOR = 0.125
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._base_rate = rate
+        self._slow_until = 0.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.rate != self._base_rate and now >= self._slow_until:
+            self.rate = self._base_rate
+    
+    def slow_down(self, factor: float = 0.5, duration: float = 60.0) -> None:
+        """Multiply the rate by `factor` (repeat calls compound) for the next `duration` seconds"""
+        self._refill()
+        self.rate = max(self.rate * factor, self._base_rate * self.MIN_RATE_FACTOR)
+        self._slow_until = time.monotonic() + duration
+    
+    async def acquire(self, cost: float = 1.0) -> None:
+        """Take `cost` tokens, waiting until they are available"""
+        self._refill()
+        self._tokens -= cost
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None, cap: float = 32.0) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based)
+    
+    Honors a numeric Retry-After header when present, otherwise uses
+    exponential backoff with up to 1s of random jitter.
+    """
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    
+    return min(cap, 2 ** attempt) + random.uniform(0, 1)
@@ -28,6 +28,9 @@ echo "API will be available at: http://localhost:8000"
 echo "API docs will be available at: http://localhost:8000/docs"
 echo ""
 
+# Apply database migrations
+alembic upgrade head
+
 # Run the application
 uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
 
@@ -0,0 +1,29 @@
+"""
+Celery application (broker and worker settings)
+
+Kept apart from worker.tasks so the API can publish tasks by name without
+importing the task code and everything it pulls in (LLM SDKs, Playwright).
+"""
+from celery import Celery
+
+from app.config import settings
+
+# Create Celery app
+celery_app = Celery(
+    'subscout_worker',
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND
+)
+
+celery_app.conf.update(
+    task_serializer='json',
+    accept_content=['json'],
+    result_serializer='json',
+    timezone='UTC',
+    enable_utc=True,
+    task_track_started=True,
+    task_time_limit=3600,  # 1 hour max
+    # Recycle prefork children to bound RSS growth (fragmentation, pooled buffers)
+    worker_max_tasks_per_child=50,
+    worker_max_memory_per_child=512000,  # KiB; checked after each task
+)
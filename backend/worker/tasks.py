@@ -1,69 +1,113 @@
 """
 Celery background tasks for email scanning and subscription detection
 """
-from celery import Celery, Task
-from typing import Dict
+from celery.signals import worker_process_shutdown
+from typing import Dict, List
+import asyncio
 import logging
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
 
 from app.config import settings
+from worker.celery_app import celery_app
 from app.services.gmail_service import gmail_service
 from app.services.detection_service import detection_service
 from app.services.unsubscribe_service import unsubscribe_service
-from app.database import AsyncSessionLocal
+from app.database import AsyncSessionLocal, engine, utc_now
 from app.models import User, Subscription, EmailImportSession, UnsubscribeAction
 from app.utils.encryption import decrypt_token
-from sqlalchemy import select
+from app.utils.process_pool import shutdown_process_pool
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+# libuv-based event loop (installed with uvicorn[standard]); stdlib asyncio otherwise
+try:
+    import uvloop  # type: ignore[import-not-found]
+except ImportError:
+    uvloop = None  # type: ignore
 
 logger = logging.getLogger(__name__)
 
-# Create Celery app
-celery_app = Celery(
-    'subscout_worker',
-    broker=settings.CELERY_BROKER_URL,
-    backend=settings.CELERY_RESULT_BACKEND
-)
-
-celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
-    timezone='UTC',
-    enable_utc=True,
-    task_track_started=True,
-    task_time_limit=3600,  # 1 hour max
-)
-
-
-@celery_app.task(bind=True, name='scan_gmail_inbox')
-def scan_gmail_inbox(self: Task, user_id: str, session_id: str, date_range_years: int = 3):
+# Emails handed to detection at once (LLM calls within a batch overlap)
+DETECTION_BATCH_SIZE = 100
+
+# Minimum seconds between scan progress writes (session row + Celery state);
+# each write also commits the subscriptions saved since the last one
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+# One event loop per worker thread, kept for the life of the process. Pooled
+# clients (Gmail/unsubscribe HTTP, Redis, DB engine, browsers) are bound to the
+# loop that opened them, so a fresh asyncio.run() per task would throw the
+# pools away each time (or trip "attached to a different loop" errors).
+_worker_loop = threading.local()
+
+
+def run_async(coro):
+    """Run a coroutine to completion on this worker thread's persistent event loop"""
+    loop = getattr(_worker_loop, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = _worker_loop.loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)
+
+
+async def _close_pooled_clients():
+    await gmail_service.aclose()
+    await detection_service.aclose()
+    await unsubscribe_service.aclose()
+    await engine.dispose()
+    shutdown_process_pool()
+
+
+@worker_process_shutdown.connect
+def _close_worker_loop(**kwargs):
+    """Close pooled clients and the event loop when a worker process exits"""
+    loop = getattr(_worker_loop, 'loop', None)
+    if loop is None or loop.is_closed():
+        return
+    
+    try:
+        loop.run_until_complete(_close_pooled_clients())
+    except Exception as e:
+        logger.warning(f"Error closing worker clients: {e}")
+    finally:
+        loop.close()
+
+
+@celery_app.task(name='scan_gmail_inbox')
+def scan_gmail_inbox(user_id: str, session_id: str, date_range_years: int = 3):
     """
     Main task: Scan user's Gmail inbox for subscriptions
     """
     logger.info(f"Starting Gmail scan for user {user_id}, session {session_id}")
     
-    import asyncio
-    return asyncio.run(_scan_gmail_inbox_async(self, user_id, session_id, date_range_years))
+    return run_async(_scan_gmail_inbox_async(user_id, session_id, date_range_years))
 
 
-async def _scan_gmail_inbox_async(task: Task, user_id: str, session_id: str, date_range_years: int):
+async def _scan_gmail_inbox_async(user_id: str, session_id: str, date_range_years: int):
     """Async implementation of scan task"""
     
+    next_page = None  # Prefetched messages.list call for the next page
+    
     async with AsyncSessionLocal() as db:
-        # Get user
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
+        # Get user and their scan session in one round trip
+        result = await db.execute(
+            select(User, EmailImportSession)
+            .outerjoin(
+                EmailImportSession,
+                and_(EmailImportSession.id == session_id, EmailImportSession.user_id == User.id)
+            )
+            .where(User.id == user_id)
+        )
+        row = result.one_or_none()
         
-        if not user:
+        if row is None:
             logger.error(f"User {user_id} not found")
             return {"error": "User not found"}
         
-        # Get session
-        result = await db.execute(
-            select(EmailImportSession).where(EmailImportSession.id == session_id)
-        )
-        session = result.scalar_one_or_none()
-        
+        user, session = row
         if not session:
             logger.error(f"Session {session_id} not found")
             return {"error": "Session not found"}
@@ -71,30 +115,67 @@ async def _scan_gmail_inbox_async(task: Task, user_id: str, session_id: str, dat
         try:
             # Refresh access token (decrypt refresh token first)
             decrypted_token = decrypt_token(user.gmail_refresh_token)
-            access_token = await gmail_service.refresh_access_token(decrypted_token)
+            access_token = await gmail_service.get_access_token(decrypted_token)
             
             # Build Gmail search query
-            date_filter = (datetime.now() - timedelta(days=365 * date_range_years)).strftime('%Y/%m/%d')
+            # UTC like every stored timestamp (datetime.now() was the worker's local time)
+            scan_started_at = datetime.utcnow()
+            date_filter = (scan_started_at - timedelta(days=365 * date_range_years)).strftime('%Y/%m/%d')
             query = f"{settings.EMAIL_SEARCH_QUERY} after:{date_filter}"
             
             # Fetch email list (paginated)
             total_processed = 0
             total_subscriptions_found = 0
             page_token = None
+            last_progress = time.monotonic()
             
             while True:
-                # Fetch batch of email IDs
-                result_dict = await gmail_service.fetch_emails(
-                    access_token=access_token,
-                    query=query,
-                    max_results=settings.GMAIL_BATCH_SIZE,
-                    page_token=page_token
-                )
+                # Cooperative cancellation: DELETE /api/scan/{id} marks the session cancelled
+                await db.refresh(session, attribute_names=['status'])
+                if session.status == 'cancelled':
+                    if next_page is not None:
+                        next_page.cancel()
+                    
+                    session.emails_processed = total_processed
+                    session.subscriptions_found = total_subscriptions_found
+                    await db.commit()
+                    
+                    logger.info(f"Scan {session_id} cancelled after {total_processed} emails")
+                    return {
+                        "status": "cancelled",
+                        "emails_processed": total_processed,
+                        "subscriptions_found": total_subscriptions_found
+                    }
+                
+                # Long scans outlive an access token; this is a cache hit until it nears
+                # expiry (then refreshed in the background, see GmailService.get_access_token)
+                access_token = await gmail_service.get_access_token(decrypted_token)
+                
+                # Fetch batch of email IDs (usually already listed in the background)
+                if next_page is not None:
+                    result_dict = await next_page
+                    next_page = None
+                else:
+                    result_dict = await gmail_service.fetch_emails(
+                        access_token=access_token,
+                        query=query,
+                        max_results=settings.GMAIL_BATCH_SIZE,
+                        page_token=page_token
+                    )
                 
                 message_list = result_dict.get('messages', [])
                 if not message_list:
                     break
                 
+                # List the next page while this one is fetched and analysed
+                if result_dict.get('nextPageToken'):
+                    next_page = asyncio.create_task(gmail_service.fetch_emails(
+                        access_token=access_token,
+                        query=query,
+                        max_results=settings.GMAIL_BATCH_SIZE,
+                        page_token=result_dict['nextPageToken']
+                    ))
+                
                 # Update session with total count (first batch only)
                 if page_token is None:
                     session.total_emails_found = result_dict.get('resultSizeEstimate', 0)
@@ -102,55 +183,65 @@ async def _scan_gmail_inbox_async(task: Task, user_id: str, session_id: str, dat
                 
                 # Fetch and process emails in this batch
                 message_ids = [msg['id'] for msg in message_list]
+                pending = []
                 
                 async for email_data in gmail_service.batch_fetch_emails(
                     access_token=access_token,
                     message_ids=message_ids
                 ):
-                    total_processed += 1
+                    pending.append(email_data)
+                    if len(pending) < DETECTION_BATCH_SIZE:
+                        continue
                     
-                    # Detect subscription
-                    subscription_data = await detection_service.detect_subscription(email_data)
+                    total_subscriptions_found += await _detect_and_save(db, user_id, pending)
+                    total_processed += len(pending)
+                    pending = []
                     
-                    if subscription_data:
-                        # Save subscription to database
-                        await _save_subscription(db, user_id, subscription_data)
-                        total_subscriptions_found += 1
-                        
-                        logger.info(
-                            f"Found subscription: {subscription_data['service_name']} "
-                            f"(${subscription_data['price']}/{subscription_data['billing_period']})"
-                        )
+                    if time.monotonic() - last_progress < PROGRESS_INTERVAL_SECONDS:
+                        continue
+                    last_progress = time.monotonic()
                     
-                    # Update progress every 100 emails
-                    if total_processed % 100 == 0:
-                        session.emails_processed = total_processed
-                        session.subscriptions_found = total_subscriptions_found
-                        await db.commit()
-                        
-                        # Update Celery task state for real-time progress
-                        task.update_state(
-                            state='PROGRESS',
-                            meta={
-                                'processed': total_processed,
-                                'total': session.total_emails_found,
-                                'subscriptions_found': total_subscriptions_found
-                            }
-                        )
+                    # Progress and the subscriptions saved so far, in one transaction
+                    session.emails_processed = total_processed
+                    session.subscriptions_found = total_subscriptions_found
+                    await db.commit()
+                
+                # Rest of the page
+                if pending:
+                    total_subscriptions_found += await _detect_and_save(db, user_id, pending)
+                    total_processed += len(pending)
                 
                 # Check if there are more pages
                 page_token = result_dict.get('nextPageToken')
                 if not page_token:
                     break
             
-            # Mark session as completed
-            session.status = 'completed'
-            session.emails_processed = total_processed
-            session.subscriptions_found = total_subscriptions_found
-            session.completed_at = datetime.utcnow()
+            # Mark session as completed, unless it was cancelled during the last page
+            result = await db.execute(
+                update(EmailImportSession)
+                .where(EmailImportSession.id == session_id, EmailImportSession.status == 'running')
+                .values(
+                    status='completed',
+                    emails_processed=total_processed,
+                    subscriptions_found=total_subscriptions_found,
+                    completed_at=utc_now()
+                )
+                .returning(EmailImportSession.id)
+            )
+            if result.scalar_one_or_none() is None:
+                session.emails_processed = total_processed
+                session.subscriptions_found = total_subscriptions_found
+                await db.commit()
+                
+                logger.info(f"Scan {session_id} cancelled after {total_processed} emails")
+                return {
+                    "status": "cancelled",
+                    "emails_processed": total_processed,
+                    "subscriptions_found": total_subscriptions_found
+                }
             
             # Update user stats
-            user.last_scan_at = datetime.utcnow()
+            user.last_scan_at = utc_now()
             user.subscription_count = total_subscriptions_found
             
             await db.commit()
@@ -159,6 +250,11 @@ async def _scan_gmail_inbox_async(task: Task, user_id: str, session_id: str, dat
                 f"Scan completed: {total_processed} emails processed, "
                 f"{total_subscriptions_found} subscriptions found"
             )
+            # Cumulative for this worker process, for tuning LLM_MIN_KEYWORD_HITS
+            logger.info(
+                f"LLM gate so far: {detection_service.stats['llm_called']} called, "
+                f"{detection_service.stats['llm_skipped']} skipped"
+            )
             
             return {
                 "status": "completed",
@@ -169,73 +265,114 @@ async def _scan_gmail_inbox_async(task: Task, user_id: str, session_id: str, dat
         except Exception as e:
             logger.error(f"Error during scan: {e}", exc_info=True)
             
-            # Mark session as failed
-            session.status = 'failed'
-            session.error_message = str(e)
+            if next_page is not None:
+                next_page.cancel()
+            
+            # The transaction may be aborted (a DB error mid-page); subscriptions
+            # saved since the last progress commit are discarded with it
+            await db.rollback()
+            
+            # Mark session as failed (a cancelled scan stays cancelled)
+            await db.execute(
+                update(EmailImportSession)
+                .where(EmailImportSession.id == session_id, EmailImportSession.status == 'running')
+                .values(status='failed', error_message=str(e))
+            )
             await db.commit()
             
             return {"error": str(e)}
 
 
-async def _save_subscription(db, user_id: str, subscription_data: Dict):
-    """
-    Save detected subscription to database
-    Handles deduplication
-    """
-    from sqlalchemy.dialects.postgresql import insert
+async def _detect_and_save(db, user_id: str, emails: List[Dict]) -> int:
+    """Run detection over a batch of emails and save what is found; returns the count saved"""
+    found = 0
+    results = await detection_service.detect_subscriptions_batch(emails)
     
-    # Check if subscription already exists (same service + user)
-    result = await db.execute(
-        select(Subscription).where(
-            Subscription.user_id == user_id,
-            Subscription.service_name == subscription_data['service_name'],
-            Subscription.status == 'active'
-        )
-    )
-    existing = result.scalar_one_or_none()
-    
-    if existing:
-        # Update existing subscription with newer data
-        existing.price = subscription_data.get('price', existing.price)
-        existing.currency = subscription_data.get('currency', existing.currency)
-        existing.billing_period = subscription_data.get('billing_period', existing.billing_period)
-        existing.next_renewal_date = subscription_data.get('next_renewal_date', existing.next_renewal_date)
-        existing.unsubscribe_link = subscription_data.get('unsubscribe_link', existing.unsubscribe_link)
-        existing.detection_confidence = subscription_data.get('confidence', existing.detection_confidence)
-        existing.last_verified_date = datetime.utcnow()
+    # One row per service: a statement's ON CONFLICT cannot update the same row twice
+    rows: Dict[str, Dict] = {}
+    now = datetime.utcnow()
+    for subscription_data in results:
+        if not subscription_data:
+            continue
         
-        # Append new source email ID
-        if subscription_data.get('source_email_id'):
-            if existing.source_email_ids:
-                existing.source_email_ids.append(subscription_data['source_email_id'])
-            else:
-                existing.source_email_ids = [subscription_data['source_email_id']]
+        row = _subscription_row(user_id, subscription_data, now)
+        previous = rows.get(row['service_name'])
+        if previous is not None:
+            row['source_email_ids'] = previous['source_email_ids'] + row['source_email_ids']
+            for field in OPTIONAL_SUBSCRIPTION_FIELDS:
+                if row[field] is None:
+                    row[field] = previous[field]
+            row['detection_confidence'] = max(row['detection_confidence'], previous['detection_confidence'])
+        rows[row['service_name']] = row
+        found += 1
         
-        logger.info(f"Updated existing subscription: {existing.service_name}")
-    
-    else:
-        # Create new subscription
-        new_subscription = Subscription(
-            user_id=user_id,
-            service_name=subscription_data['service_name'],
-            price=subscription_data['price'],
-            currency=subscription_data.get('currency', 'USD'),
-            billing_period=subscription_data['billing_period'],
-            next_renewal_date=subscription_data.get('next_renewal_date'),
-            unsubscribe_link=subscription_data.get('unsubscribe_link'),
-            subscription_tier=subscription_data.get('subscription_tier'),
-            detection_confidence=subscription_data.get('confidence', 0.5),
-            detected_by=subscription_data.get('detected_by', 'llm'),
-            source_email_ids=[subscription_data.get('source_email_id')],
-            first_detected_date=datetime.utcnow().date(),
-            last_verified_date=datetime.utcnow(),
-            status='active'
+        logger.info(
+            "Found subscription: %s ($%s/%s)",
+            subscription_data['service_name'], subscription_data['price'], subscription_data['billing_period']
         )
-        
-        db.add(new_subscription)
-        logger.info(f"Created new subscription: {new_subscription.service_name}")
     
-    await db.commit()
+    if rows:
+        await _upsert_subscriptions(db, list(rows.values()))
+    
+    return found
+
+
+# Fields a newer email without them should not clear on an existing subscription
+OPTIONAL_SUBSCRIPTION_FIELDS = ('next_renewal_date', 'unsubscribe_link', 'subscription_tier')
+
+
+def _subscription_row(user_id: str, subscription_data: Dict, now: datetime) -> Dict:
+    """INSERT values for a detected subscription"""
+    source_email_id = subscription_data.get('source_email_id')
+    return {
+        'id': uuid.uuid4(),
+        'user_id': user_id,
+        'service_name': subscription_data['service_name'],
+        'price': subscription_data['price'],
+        'currency': subscription_data.get('currency') or 'USD',
+        'billing_period': subscription_data['billing_period'],
+        'next_renewal_date': subscription_data.get('next_renewal_date'),
+        'unsubscribe_link': subscription_data.get('unsubscribe_link'),
+        'subscription_tier': subscription_data.get('subscription_tier'),
+        'detection_confidence': subscription_data.get('confidence', 0.5),
+        'detected_by': subscription_data.get('detected_by', 'llm'),
+        'source_email_ids': [source_email_id] if source_email_id else [],
+        'first_detected_date': now.date(),
+        'last_verified_date': now,
+        'status': 'active',
+    }
+
+
+async def _upsert_subscriptions(db, rows: List[Dict]):
+    """
+    Save detected subscriptions in one statement
+    
+    New services are inserted; an active subscription for the same service
+    (unique per user, see uq_subscriptions_user_id_service_name_active) gets
+    the newer price/period, the higher confidence and the new source email
+    IDs appended.
+    The caller commits (together with the scan progress).
+    """
+    stmt = insert(Subscription).values(rows)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Subscription.user_id, Subscription.service_name],
+        index_where=Subscription.status == 'active',
+        set_={
+            'price': excluded.price,
+            'currency': excluded.currency,
+            'billing_period': excluded.billing_period,
+            'next_renewal_date': func.coalesce(excluded.next_renewal_date, Subscription.next_renewal_date),
+            'unsubscribe_link': func.coalesce(excluded.unsubscribe_link, Subscription.unsubscribe_link),
+            'subscription_tier': func.coalesce(excluded.subscription_tier, Subscription.subscription_tier),
+            'detection_confidence': func.greatest(excluded.detection_confidence, Subscription.detection_confidence),
+            'last_verified_date': excluded.last_verified_date,
+            'source_email_ids': func.array_cat(Subscription.source_email_ids, excluded.source_email_ids),
+            'updated_at': utc_now(),
+        }
+    )
+    
+    await db.execute(stmt)
 
 
 @celery_app.task(name='execute_unsubscribe')
@@ -243,87 +380,112 @@ def execute_unsubscribe(subscription_id: str, action_id: str, user_access_token:
     """
     Task: Execute unsubscribe action
     """
-    import asyncio
-    return asyncio.run(_execute_unsubscribe_async(subscription_id, action_id, user_access_token))
+    return run_async(_execute_unsubscribe_async(subscription_id, action_id, user_access_token))
 
 
 async def _execute_unsubscribe_async(subscription_id: str, action_id: str, user_access_token: str):
     """Async implementation of unsubscribe task"""
     
     async with AsyncSessionLocal() as db:
-        # Get subscription
+        # Claim the action (pending -> in_progress) and read the subscription's link in one
+        # statement; a duplicate or redelivered task finds nothing left to claim
         result = await db.execute(
-            select(Subscription).where(Subscription.id == subscription_id)
-        )
-        subscription = result.scalar_one_or_none()
-        
-        if not subscription:
-            return {"error": "Subscription not found"}
-        
-        # Get unsubscribe action
-        result = await db.execute(
-            select(UnsubscribeAction).where(UnsubscribeAction.id == action_id)
+            update(UnsubscribeAction)
+            .where(
+                UnsubscribeAction.id == action_id,
+                UnsubscribeAction.subscription_id == subscription_id,
+                UnsubscribeAction.status == 'pending',
+                Subscription.id == UnsubscribeAction.subscription_id
+            )
+            .values(status='in_progress')
+            .returning(Subscription.unsubscribe_link)
         )
-        action = result.scalar_one_or_none()
+        row = result.one_or_none()
+        await db.commit()
         
-        if not action:
-            return {"error": "Unsubscribe action not found"}
+        if row is None:
+            return {"error": "Unsubscribe action not found or already started"}
         
         try:
-            # Update action status
-            action.status = 'in_progress'
-            await db.commit()
-            
             # Attempt cancellation
             result = await unsubscribe_service.initiate_cancellation(
                 subscription_id=subscription_id,
-                unsubscribe_url=subscription.unsubscribe_link,
+                unsubscribe_url=row.unsubscribe_link,
                 user_access_token=user_access_token
             )
             
             # Update action with result
-            action.action_type = result['action_type']
-            action.http_status_code = result.get('http_status')
-            action.requires_manual_action = result['requires_user_action']
+            action_values = {
+                'action_type': result['action_type'],
+                'http_status_code': result.get('http_status'),
+                'requires_manual_action': result['requires_user_action'],
+            }
             
             if result['requires_user_action']:
-                action.manual_instructions = result.get('instructions', '')
+                action_values['manual_instructions'] = result.get('instructions', '')
             
             if result['status'] == 'success':
-                action.status = 'awaiting_confirmation'
-                action.monitoring_until = datetime.utcnow() + timedelta(
+                action_values['status'] = 'awaiting_confirmation'
+                action_values['monitoring_until'] = datetime.utcnow() + timedelta(
                     days=settings.CONFIRMATION_MONITORING_DAYS
                 )
-                subscription.status = 'pending_cancellation'
-                
-                # Schedule confirmation monitoring task
-                celery_app.send_task(
-                    'monitor_cancellation_confirmation',
-                    args=[subscription_id, action_id, user_access_token],
-                    countdown=3600  # Check in 1 hour
+                await db.execute(
+                    update(Subscription)
+                    .where(Subscription.id == subscription_id)
+                    .values(status='pending_cancellation')
                 )
             
             elif result['status'] == 'manual_required':
-                action.status = 'manual_required'
+                action_values['status'] = 'manual_required'
             
             else:
-                action.status = 'failed'
-                action.error_message = result.get('message', 'Unknown error')
+                action_values['status'] = 'failed'
+                action_values['error_message'] = result.get('message', 'Unknown error')
             
+            await db.execute(
+                update(UnsubscribeAction).where(UnsubscribeAction.id == action_id).values(**action_values)
+            )
             await db.commit()
             
+            if result['status'] == 'success':
+                await _schedule_confirmation_monitoring(subscription_id, action_id, user_access_token)
+            
             return result
         
         except Exception as e:
             logger.error(f"Unsubscribe execution failed: {e}", exc_info=True)
             
-            action.status = 'failed'
-            action.error_message = str(e)
+            await db.rollback()
+            await db.execute(
+                update(UnsubscribeAction)
+                .where(UnsubscribeAction.id == action_id)
+                .values(status='failed', error_message=str(e))
+            )
             await db.commit()
             
             return {"error": str(e)}
 
 
+async def _schedule_confirmation_monitoring(subscription_id: str, action_id: str, user_access_token: str):
+    """
+    Queue the confirmation check for an hour from now
+    
+    Called after the outcome is committed, so no transaction is held open for
+    the broker round trip; send_task is blocking and runs in a thread (it
+    reuses the app's pooled broker producer). A broker failure is logged
+    rather than failing the already recorded cancellation.
+    """
+    try:
+        await asyncio.to_thread(
+            celery_app.send_task,
+            'monitor_cancellation_confirmation',
+            args=[subscription_id, action_id, user_access_token],
+            countdown=3600  # Check in 1 hour
+        )
+    except Exception as e:
+        logger.error(f"Could not schedule confirmation monitoring for action {action_id}: {e}")
+
+
 # Celery beat schedule for periodic tasks
 celery_app.conf.beat_schedule = {
     'check_renewal_reminders': {